@@ -1,174 +1,3744 @@
-import logging
-from langchain.runnables import Runnable, Chain
-from langchain.memory import Memory
-from langchain.llm import LLM
-from minio import Minio
-import pandas as pd
-from io import BytesIO
-
-logging.basicConfig(level=logging.INFO)
-
-class MinioManager(Runnable):
-    """Manage Minio client connection."""
-    def __init__(self):
-        self.minio_client = Minio(
-            endpoint='minio.example.com',
-            access_key='your-access-key',
-            secret_key='your-secret-key',
-            secure=False
-        )
-
-    def get_client(self):
-        """Get Minio client."""
-        return self.minio_client
-
-
-class BucketManager(Runnable):
-    """Manage bucket creation."""
-    def __init__(self, minio_manager):
-        self.minio_client = minio_manager.get_client()
-
-    def run(self, bucket_name):
-        """Ensure bucket exists, create if not."""
-        if not self.minio_client.bucket_exists(bucket_name):
-            self.minio_client.make_bucket(bucket_name)
-            logging.info(f'Bucket {bucket_name} created.')
-        return bucket_name
-
-
-class DataIngestion(Runnable):
-    """Handle data ingestion into a specified bucket."""
-    def __init__(self, minio_manager):
-        self.minio_client = minio_manager.get_client()
-
-    def run(self, bucket_name, data, object_name):
-        """Ingest data into specified bucket."""
-        try:
-            self.minio_client.put_object(
-                bucket_name, object_name, data,
-                length=len(data),
-            )
-            logging.info(f'Data ingested to {bucket_name}/{object_name}.')
-        except Exception as e:
-            logging.error(f'Error in data ingestion: {str(e)}')
-        return object_name
-
-
-class DataRetrieval(Runnable):
-    """Handle data retrieval from a specified bucket."""
-    def __init__(self, minio_manager):
-        self.minio_client = minio_manager.get_client()
-
-    def run(self, bucket_name, object_name):
-        """Retrieve data from specified bucket."""
-        data = self.minio_client.get_object(bucket_name, object_name)
-        logging.info(f'Data retrieved from {bucket_name}/{object_name}.')
-        return data.read()
-
-
-class DataLoader(Runnable):
-    """Load data into a Pandas DataFrame."""
-    def __init__(self, data_retrieval):
-        self.data_retrieval = data_retrieval
-
-    def run(self, bucket_name, object_name):
-        """Load data from specified object in bucket into DataFrame."""
-        data = self.data_retrieval.run(bucket_name, object_name)
-        data_buffer = BytesIO(data)
-        df = pd.read_csv(data_buffer)  # Assuming CSV format, adjust as needed
-        logging.info(f'Data loaded from {bucket_name}/{object_name} into DataFrame.')
-        return df
-
-
-class SchemaInference(Runnable):
-    """Infer schema from a Pandas DataFrame."""
-    def run(self, df):
-        """Infer schema from DataFrame."""
-        schema = df.dtypes.to_dict()
-        logging.info('Schema inferred.')
-        return schema
-
-
-class SchemaDefinitionGenerator(Runnable):
-    """Generate schema definition file from inferred schema."""
-    def run(self, schema, file_path):
-        """Generate schema definition file."""
-        with open(file_path, 'w') as f:
-            for column, dtype in schema.items():
-                f.write(f'{column}: {dtype}\\n')
-        logging.info(f'Schema definition generated at {file_path}.')
-        return file_path
-
-
-class LanguageLearningChain(Chain):
-    """Custom LLM chain for language learning."""
-    def __init__(self, model_name):
-        super().__init__()
-
-        self.add_runnable(LLM(
-            model_name=model_name,
-            input_key='input',
-            output_key='output'
-        ))
-
-
-class DataLakeAgent(Runnable):
-    """Agent to coordinate data lake operations."""
-    memory = Memory()
-
-    def __init__(self, minio_manager):
-        self.minio_manager = minio_manager
-        self.bucket_manager = BucketManager(minio_manager)
-        self.data_ingestion = DataIngestion(minio_manager)
-        self.data_retrieval = DataRetrieval(minio_manager)
-        self.data_loader = DataLoader(self.data_retrieval)
-        self.schema_inference = SchemaInference()
-        self.schema_definition_generator = SchemaDefinitionGenerator()
-        self.language_learning_chain = LanguageLearningChain('your-llm-model-name')
-
-    def run(self, action, **kwargs):
-        """Coordinate operations based on specified action."""
-        self.memory.load_memory_variables(kwargs)
-        if action == 'ingest':
-            return Chain([self.bucket_manager, self.data_ingestion]).run(**kwargs)
-        elif action == 'retrieve':
-            return self.data_retrieval_chain.run(**kwargs)
-        elif action == 'generate_schema':
-            return Chain([self.data_loader, self.schema_inference, self.schema_definition_generator]).run(**kwargs)
-        elif action == 'learn_language':
-            return self.language_learning_chain.run(**kwargs)
-        else:
-            raise ValueError(f"Unknown action: {action}")
-
-# Usage example:
-minio_manager = MinioManager()
-agent = DataLakeAgent(minio_manager)
-
-# Ingest data
-agent.run('ingest', bucket_name='example_bucket', data=b'sample data', object_name='data.txt')
-
-# Generate schema
-agent.run('generate_schema', bucket_name='example_bucket', object_name='data.txt', file_path='schema.txt')
-
-# Learn language using custom LLM chain
-agent.run('learn_language', input='input text')
-
-# Prompt and Prompt Template:
-from langchain.prompts import PromptTemplate
-
-# Define a prompt template
-prompt_template = PromptTemplate.from_template(
-    "You are a DataLakeAgent capable of ingesting data, retrieving data, generating schema, "
-    "and learning language. Your actions are governed by the instructions provided here. "
-    "Now, {action} with the following parameters: {parameters}."
-)
-
-# Format the prompt template with specific instructions
-prompt = prompt_template.format(action='ingest', parameters={
-    'bucket_name': 'example_bucket',
-    'data': 'sample data',
-    'object_name': 'data.txt'
-})
-
-# The generated prompt can be passed to the DataLakeAgent
-# agent.run() method can be modified to accept a prompt argument and parse it for instructions
\ No newline at end of file
+import asyncio
+import atexit
+import collections
+import contextvars
+import datetime
+import decimal
+import functools
+import hashlib
+import heapq
+import inspect
+import io
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+import zlib
+from concurrent.futures import (
+    FIRST_COMPLETED, CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait,
+)
+import urllib3
+from langchain.runnables import Runnable, Chain
+from langchain.memory import Memory
+from langchain.llm import LLM
+from minio import Minio
+from minio.datatypes import Part
+from minio.deleteobjects import DeleteObject
+from minio.error import InvalidResponseError, S3Error, ServerError
+import numpy as np
+import pandas as pd
+from io import BytesIO
+
+try:
+    import zstandard
+except ImportError:  # the zstd codec is optional
+    zstandard = None
+
+try:
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Parquet and Arrow IPC readers are optional
+    pyarrow = None
+
+logging.basicConfig(level=logging.INFO)
+
+# S3 rejects multipart parts smaller than 5 MiB (except the last one).
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+DEFAULT_MAX_IN_FLIGHT_PARTS = 4
+# Keep the connection pool larger than the batch pool so workers never queue
+# on (or discard) pooled connections.
+DEFAULT_MAX_CONNECTIONS = 32
+DEFAULT_BATCH_WORKERS = 16
+DEFAULT_ASYNC_CONCURRENCY = DEFAULT_MAX_CONNECTIONS
+DEFAULT_READ_CHUNK_SIZE = 1024 * 1024
+DEFAULT_DOWNLOAD_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_DOWNLOAD_WORKERS = 8
+DEFAULT_PREFETCH_DEPTH = 8
+DEFAULT_PREFETCH_BYTES = 256 * 1024 * 1024
+DEFAULT_CSV_CHUNKSIZE = 100_000
+DEFAULT_SAMPLE_ROWS = 10_000
+DEFAULT_SAMPLE_STRATA = 32
+DEFAULT_SPOOL_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_SPOOL_BATCH_SIZE = 64
+# Content-addressed blobs live under this prefix in each bucket; logical keys
+# become small pointer objects whose metadata names the blob.
+CAS_PREFIX = '.cas/sha256/'
+BLOB_POINTER_HEADER = 'x-amz-meta-cda-blob'
+CODEC_HEADER = 'x-amz-meta-cda-codec'
+# Packed small objects: SEGMENT_PREFIX<id>.seg holds the concatenated payloads,
+# SEGMENT_PREFIX<id>.idx maps each logical key to [offset, length] within it.
+SEGMENT_PREFIX = '.segments/'
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+DEFAULT_SEGMENT_MAX_AGE = 5.0
+DEFAULT_SEGMENT_RELOAD_INTERVAL = 1.0
+SYNC_MANIFEST_NAME = '.cda-sync-manifest.json'
+STATS_SUFFIX = '.stats.json'
+HLL_PRECISION = 12
+DEFAULT_MEMORY_CACHE_BYTES = 256 * 1024 * 1024
+DEFAULT_DISK_CACHE_BYTES = 4 * 1024 * 1024 * 1024
+
+
+def iter_parts(data, part_size):
+    """Yield bytes, a file-like object or a byte iterator as `part_size` pieces.
+
+    Only one part (plus whatever the source hands back from a single read) is
+    buffered at a time, so arbitrarily large sources stream in bounded memory.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        view = memoryview(data)
+        for offset in range(0, len(view), part_size):
+            yield bytes(view[offset:offset + part_size])
+        return
+    if hasattr(data, 'read'):
+        chunks = iter(lambda: data.read(part_size), b'')
+    else:
+        chunks = iter(data)
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def metadata_headers(metadata):
+    """Turn user metadata into `x-amz-meta-*` request headers."""
+    headers = {}
+    for key, value in (metadata or {}).items():
+        if not key.lower().startswith('x-amz-meta-'):
+            key = f'x-amz-meta-{key}'
+        headers[key] = value
+    return headers
+
+
+def client_endpoint(minio_client):
+    """Host (and port) a client talks to, as a key that is stable across processes."""
+    base_url = getattr(minio_client, '_base_url', None)
+    return base_url.host if base_url is not None else f'client-{id(minio_client)}'
+
+class MinioManager(Runnable):
+    """Manage Minio client connection."""
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS, endpoint='minio.example.com',
+                 access_key='your-access-key', secret_key='your-secret-key', secure=False):
+        # Kept so worker processes can build their own client.
+        self.config = {
+            'max_connections': max_connections, 'endpoint': endpoint,
+            'access_key': access_key, 'secret_key': secret_key, 'secure': secure,
+        }
+        self.minio_client = Minio(
+            endpoint=endpoint,
+            access_key=access_key,
+            secret_key=secret_key,
+            secure=secure,
+            http_client=urllib3.PoolManager(
+                maxsize=max_connections,
+                timeout=urllib3.Timeout(connect=300, read=300),
+                retries=urllib3.Retry(
+                    total=5, backoff_factor=0.2,
+                    status_forcelist=[500, 502, 503, 504],
+                ),
+            ),
+        )
+
+    def get_client(self):
+        """Get Minio client."""
+        return self.minio_client
+
+
+class Codec:
+    """Streaming compression codec, recorded on objects under CODEC_HEADER."""
+    def __init__(self, name, compressor, decompressor, default_level):
+        self.name = name
+        self._compressor = compressor
+        self._decompressor = decompressor
+        self.default_level = default_level
+
+    def compressor(self, level=None):
+        """Return an object with compress(chunk) and flush()."""
+        return self._compressor(self.default_level if level is None else level)
+
+    def decompressor(self):
+        """Return an object with decompress(chunk) and flush()."""
+        return self._decompressor()
+
+
+def _zstd_compressor(level):
+    if zstandard is None:
+        raise ValueError('The zstd codec requires the zstandard package.')
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+
+def _zstd_decompressor():
+    if zstandard is None:
+        raise ValueError('The zstd codec requires the zstandard package.')
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+CODECS = {
+    'gzip': Codec(
+        'gzip',
+        lambda level: zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS),
+        lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+        default_level=6,
+    ),
+    'zstd': Codec('zstd', _zstd_compressor, _zstd_decompressor, default_level=3),
+}
+
+
+def get_codec(name):
+    """Look up a codec by name; None and 'none' mean no compression."""
+    if name in (None, 'none'):
+        return None
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown codec: {name}") from None
+
+
+def compress_chunks(chunks, codec, level=None):
+    """Compress an iterator of byte chunks."""
+    compressor = codec.compressor(level)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def decompress_chunks(chunks, codec):
+    """Decompress an iterator of byte chunks."""
+    decompressor = codec.decompressor()
+    for chunk in chunks:
+        decompressed = decompressor.decompress(chunk)
+        if decompressed:
+            yield decompressed
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def slice_chunks(chunks, offset=0, length=None, tail=None):
+    """Yield bytes [offset, offset + length) of a chunk stream, or its last `tail` bytes."""
+    if tail is not None:
+        last = bytearray()
+        for chunk in chunks:
+            last += chunk
+            del last[:max(len(last) - tail, 0)]
+        if last:
+            yield bytes(last)
+        return
+    remaining = length
+    for chunk in chunks:
+        if offset >= len(chunk):
+            offset -= len(chunk)
+            continue
+        chunk, offset = chunk[offset:], 0
+        if remaining is not None:
+            chunk = chunk[:remaining]
+            remaining -= len(chunk)
+        if chunk:
+            yield chunk
+        if remaining == 0:
+            return
+
+
+def check_cancelled(cancel_event):
+    """Raise CancelledError once an async caller has given up on the transfer."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise CancelledError()
+
+
+def cancellable(chunks, cancel_event):
+    """Pass chunks through, stopping with CancelledError once cancel_event is set."""
+    for chunk in chunks:
+        check_cancelled(cancel_event)
+        yield chunk
+
+
+def payload_size(value):
+    """Size in bytes of a data payload (bytes or DataFrame), else 0."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=False).sum())
+    return 0
+
+
+_current_span = contextvars.ContextVar('cda_span', default=None)
+
+
+class Span:
+    """One timed operation: wall and CPU time, bytes in and out, error, parent.
+
+    CPU time is that of the thread that opened the span, so work handed to
+    a thread or process pool shows up as wall time only.
+    """
+    __slots__ = ('tracer', 'name', 'attributes', 'span_id', 'parent_id', 'thread_id',
+                 'start', 'wall', 'cpu', 'bytes_in', 'bytes_out', 'error', '_token', '_cpu')
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(tracer._ids)
+        self.bytes_in = self.bytes_out = 0
+        self.error = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.thread_id = threading.get_ident()
+        self._token = _current_span.set(self)
+        self.start = time.time_ns()
+        self._cpu = time.thread_time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cpu = time.thread_time_ns() - self._cpu
+        self.wall = time.time_ns() - self.start
+        if exc is not None:
+            self.error = f'{exc_type.__name__}: {exc}'
+        _current_span.reset(self._token)
+        self.tracer._finish(self)
+        return False
+
+    def add(self, bytes_in=0, bytes_out=0):
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    def to_dict(self):
+        return {
+            'name': self.name, 'span_id': self.span_id, 'parent_id': self.parent_id,
+            'thread_id': self.thread_id, 'start_us': self.start // 1000,
+            'wall_ms': self.wall / 1e6, 'cpu_ms': self.cpu / 1e6,
+            'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out, 'error': self.error,
+            'attributes': self.attributes,
+        }
+
+
+class _NullSpan:
+    """Stand-in returned while tracing is off; every method is a no-op."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def add(self, bytes_in=0, bytes_out=0):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects nested spans for agent pipelines and the stages under them.
+
+    Off by default; while off, span() returns a shared no-op and traced
+    functions cost one attribute check. Finished spans are kept in memory
+    (the newest max_spans) until exported as JSON lines or as a Chrome
+    trace (chrome://tracing, Perfetto).
+    """
+    def __init__(self, enabled=False, max_spans=100_000):
+        self.enabled = enabled
+        self.spans = collections.deque(maxlen=max_spans)
+        self._ids = itertools.count(1)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self.spans.clear()
+
+    def span(self, name, **attributes):
+        """Context manager timing a block as a child of the current span."""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attributes)
+
+    def add(self, bytes_in=0, bytes_out=0):
+        """Count bytes against the innermost open span, if any."""
+        span = _current_span.get()
+        if span is not None:
+            span.add(bytes_in, bytes_out)
+
+    def counted(self, data, direction='bytes_in'):
+        """Pass a payload through, counting its bytes against the current span.
+
+        bytes count at once; file objects and chunk iterators count each chunk
+        as it is read, so streamed payloads are measured too.
+        """
+        span = _current_span.get() if self.enabled else None
+        if span is None:
+            return data
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            span.add(**{direction: len(data)})
+            return data
+        if hasattr(data, 'read'):
+            data = iter(lambda: data.read(DEFAULT_READ_CHUNK_SIZE), b'')
+        return self._count_chunks(span, data, direction)
+
+    @staticmethod
+    def _count_chunks(span, chunks, direction):
+        for chunk in chunks:
+            span.add(**{direction: len(chunk)})
+            yield chunk
+
+    def _finish(self, span):
+        self.spans.append(span)  # deque.append is atomic
+
+    def export_jsonl(self, path):
+        """Write one JSON object per finished span."""
+        with open(path, 'w') as f:
+            for span in list(self.spans):
+                f.write(json.dumps(span.to_dict(), default=str) + '\n')
+        return path
+
+    def export_chrome(self, path):
+        """Write finished spans in the Chrome trace event format."""
+        events = [
+            {
+                'name': span.name, 'ph': 'X', 'pid': os.getpid(), 'tid': span.thread_id,
+                'ts': span.start / 1000, 'dur': span.wall / 1000,
+                'args': {
+                    'cpu_ms': span.cpu / 1e6, 'bytes_in': span.bytes_in,
+                    'bytes_out': span.bytes_out, 'error': span.error, **span.attributes,
+                },
+            }
+            for span in list(self.spans)
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+        return path
+
+
+tracer = Tracer()
+
+
+def traced(name, payload=True):
+    """Decorator recording each call as a span, with payload arguments as bytes
+    in and a payload result as bytes out.
+
+    Functions that stream their payload pass payload=False and count bytes
+    themselves with tracer.counted().
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with tracer.span(name) as span:
+                if payload:
+                    arguments = itertools.chain(args, kwargs.values())
+                    span.add(bytes_in=sum(map(payload_size, arguments)))
+                result = fn(*args, **kwargs)
+                if payload:
+                    span.add(bytes_out=payload_size(result))
+                return result
+        return wrapper
+    return decorate
+
+
+def in_context(fn):
+    """Wrap fn to run in a copy of the caller's context, for thread pools.
+
+    Pool threads do not inherit context variables, so without this spans
+    opened by fn would not nest under the caller's span. Each call gets its
+    own copy, since a context cannot be entered by two threads at once.
+    Returns fn itself while tracing is off.
+    """
+    if not tracer.enabled:
+        return fn
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+class AsyncGate:
+    """Run blocking MinIO calls from asyncio under a concurrency limit.
+
+    minio-py is synchronous, so calls run on a thread pool sized to `limit`.
+    A per-loop semaphore keeps surplus coroutines parked in the event loop
+    rather than queued in the executor. When the awaiting task is cancelled,
+    the call's cancel_event is set so streaming transfers stop between chunks.
+    Size the MinioManager connection pool to at least `limit`.
+    """
+    def __init__(self, limit=DEFAULT_ASYNC_CONCURRENCY):
+        self.limit = limit
+        self._executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix='minio-async')
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    async def call(self, fn, *args, **kwargs):
+        """Await fn(*args, cancel_event=<Event>, **kwargs) on the gate's pool."""
+        cancel_event = threading.Event()
+        call = functools.partial(fn, *args, cancel_event=cancel_event, **kwargs)
+        async with self._semaphore():
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._executor, in_context(call)
+                )
+            except asyncio.CancelledError:
+                cancel_event.set()
+                raise
+
+
+async_gate = AsyncGate()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls sharing a key into one in-flight execution.
+
+    do() serves threads and ado() coroutines; latecomers wait for the
+    leader's call and receive its result or exception. Results are shared,
+    not copied, so only use it for immutable values such as bytes.
+    """
+    def __init__(self):
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = weakref.WeakKeyDictionary()
+
+    def do(self, key, fn):
+        """Return fn(), or the result of an identical call already running."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            self.stats['coalesced'] += 1
+            return future.result()
+        self.stats['calls'] += 1
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def ado(self, key, coro_fn):
+        """Await coro_fn() once per key for all concurrent awaiters in this loop.
+
+        The shared call runs as its own task, so a cancelled awaiter does not
+        cancel it for the others; it is cancelled only when every awaiter is.
+        """
+        calls = self._async_calls.setdefault(asyncio.get_running_loop(), {})
+        entry = calls.get(key)
+        if entry is None:
+            entry = calls[key] = [asyncio.ensure_future(coro_fn()), 0]
+            entry[0].add_done_callback(
+                lambda _: calls.pop(key) if calls.get(key) is entry else None
+            )
+            self.stats['calls'] += 1
+        else:
+            self.stats['coalesced'] += 1
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not entry[0].done():
+                # The task only finishes cancelling later; newcomers start afresh.
+                if calls.get(key) is entry:
+                    del calls[key]
+                entry[0].cancel()
+
+
+inflight_reads = SingleFlight()
+
+
+class BucketCache:
+    """Process-wide record of buckets known to exist, trusted for `ttl` seconds."""
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, bucket_name):
+        expires = self._expires.get(bucket_name)
+        return expires is not None and expires > time.monotonic()
+
+    def add(self, bucket_name):
+        """Remember that bucket_name exists."""
+        with self._lock:
+            self._expires[bucket_name] = time.monotonic() + self.ttl
+
+    def invalidate(self, bucket_name=None):
+        """Forget one bucket, or every bucket when bucket_name is None."""
+        with self._lock:
+            if bucket_name is None:
+                self._expires.clear()
+            else:
+                self._expires.pop(bucket_name, None)
+
+
+known_buckets = BucketCache()
+
+
+class DigestIndex:
+    """Local index of content digests already stored in each bucket.
+
+    Entries are keyed by (endpoint, bucket, digest), so clients of different
+    MinIO deployments never vouch for each other's blobs. Lookups never
+    touch MinIO; DataIngestion confirms a hit with a HEAD on the blob before
+    skipping its upload. Pass `path` to persist the index in SQLite across
+    restarts, or call warm() to seed it from a bucket's blob listing.
+    """
+    def __init__(self, path=None):
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS blobs (endpoint TEXT, bucket TEXT, digest TEXT, '
+                'PRIMARY KEY (endpoint, bucket, digest))'
+            )
+            self._seen.update(self._db.execute('SELECT endpoint, bucket, digest FROM blobs'))
+
+    def __contains__(self, key):
+        """Whether (endpoint, bucket_name, digest) is recorded."""
+        return key in self._seen
+
+    def add(self, endpoint, bucket_name, digest):
+        """Record that bucket_name on endpoint holds the blob for digest."""
+        with self._lock:
+            self._seen.add((endpoint, bucket_name, digest))
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR IGNORE INTO blobs VALUES (?, ?, ?)', (endpoint, bucket_name, digest)
+                )
+                self._db.commit()
+
+    def discard(self, endpoint, bucket_name, digest=None):
+        """Forget one digest, or every digest of a bucket when digest is None."""
+        with self._lock:
+            self._seen -= {
+                key for key in self._seen
+                if key[:2] == (endpoint, bucket_name) and digest in (None, key[2])
+            }
+            if self._db is not None:
+                if digest is None:
+                    self._db.execute('DELETE FROM blobs WHERE endpoint = ? AND bucket = ?',
+                                     (endpoint, bucket_name))
+                else:
+                    self._db.execute(
+                        'DELETE FROM blobs WHERE endpoint = ? AND bucket = ? AND digest = ?',
+                        (endpoint, bucket_name, digest),
+                    )
+                self._db.commit()
+
+    def warm(self, minio_client, bucket_name):
+        """Seed the index from the blobs already stored in bucket_name."""
+        endpoint = client_endpoint(minio_client)
+        for obj in minio_client.list_objects(bucket_name, prefix=CAS_PREFIX, recursive=True):
+            self.add(endpoint, bucket_name, obj.object_name.rsplit('/', 1)[-1])
+
+
+known_digests = DigestIndex()
+
+
+def blob_name(digest):
+    """Object name of the content-addressed blob for a sha256 hex digest."""
+    return f'{CAS_PREFIX}{digest[:2]}/{digest}'
+
+
+class SegmentIndex:
+    """Maps logical keys of packed objects to (segment, offset, length).
+
+    Segment names sort by creation time, so a key packed more than once
+    resolves to its newest copy, whatever order the indexes arrive in. A key
+    written as an object of its own is discarded, and older segments loaded
+    afterwards do not bring it back.
+    """
+    def __init__(self):
+        self._members = {}
+        self._segments = set()
+        self._superseded = {}
+        self._loaded_at = {}
+        self._lock = threading.Lock()
+
+    def get(self, bucket_name, object_name):
+        """Return (segment_name, offset, length), or None if the key is not packed."""
+        return self._members.get((bucket_name, object_name))
+
+    def add(self, bucket_name, segment_name, members):
+        """Register a segment's {object_name: (offset, length)} members."""
+        with self._lock:
+            self._segments.add((bucket_name, segment_name))
+            for object_name, (offset, length) in members.items():
+                if segment_name < self._superseded.get((bucket_name, object_name), ''):
+                    continue
+                current = self._members.get((bucket_name, object_name))
+                if current is None or current[0] <= segment_name:
+                    self._members[(bucket_name, object_name)] = (segment_name, offset, length)
+
+    def discard(self, bucket_name, object_name):
+        """Forget a packed key once it has been written as a plain object."""
+        with self._lock:
+            if self._members.pop((bucket_name, object_name), None) is not None:
+                self._superseded[(bucket_name, object_name)] = (
+                    f'{SEGMENT_PREFIX}{time.time_ns():020d}'
+                )
+
+    def keys(self, bucket_name, prefix=''):
+        """Logical keys packed in bucket_name under prefix."""
+        return sorted(key for bucket, key in list(self._members)
+                      if bucket == bucket_name and key.startswith(prefix))
+
+    def load(self, minio_client, bucket_name):
+        """Read the segment indexes in bucket_name not seen yet; return how many.
+
+        DataRetrieval calls this when MinIO has no object for a key, to find
+        keys packed by other processes.
+        """
+        indexes = [
+            obj.object_name for obj in minio_client.list_objects(
+                bucket_name, prefix=SEGMENT_PREFIX, recursive=True
+            ) if obj.object_name.endswith('.idx')
+            and (bucket_name, obj.object_name[:-len('.idx')] + '.seg') not in self._segments
+        ]
+        for index_name in indexes:
+            response = minio_client.get_object(bucket_name, index_name)
+            try:
+                members = json.loads(response.read())
+            finally:
+                response.close()
+                response.release_conn()
+            self.add(bucket_name, index_name[:-len('.idx')] + '.seg', members)
+        logging.info(f'Loaded {len(indexes)} segment indexes from {bucket_name}.')
+        return len(indexes)
+
+    def refresh(self, minio_client, bucket_name, min_interval=DEFAULT_SEGMENT_RELOAD_INTERVAL):
+        """load() bucket_name, unless it was loaded less than min_interval seconds ago.
+
+        Bounds the LISTs of .segments/ that misses cost in buckets with few
+        or no packed keys; a key packed elsewhere in the meantime is found
+        on the next refresh.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._loaded_at.get(bucket_name, float('-inf')) < min_interval:
+                return 0
+            self._loaded_at[bucket_name] = now
+        return self.load(minio_client, bucket_name)
+
+
+known_segments = SegmentIndex()
+
+
+class BucketManager(Runnable):
+    """Manage bucket creation."""
+    def __init__(self, minio_manager, bucket_cache=None, async_gate=async_gate):
+        self.minio_client = minio_manager.get_client()
+        self.bucket_cache = known_buckets if bucket_cache is None else bucket_cache
+        self.async_gate = async_gate
+
+    def run(self, bucket_name):
+        """Ensure bucket exists, create if not."""
+        if bucket_name in self.bucket_cache:
+            return bucket_name
+        return self._ensure(bucket_name)
+
+    async def arun(self, bucket_name):
+        """Async variant of run."""
+        if bucket_name in self.bucket_cache:
+            return bucket_name
+        return await self.async_gate.call(self._ensure, bucket_name)
+
+    @traced('BucketManager.ensure')
+    def _ensure(self, bucket_name, cancel_event=None):
+        if not self.minio_client.bucket_exists(bucket_name):
+            try:
+                self.minio_client.make_bucket(bucket_name)
+                logging.info(f'Bucket {bucket_name} created.')
+            except S3Error as e:
+                if e.code not in ('BucketAlreadyOwnedByYou', 'BucketAlreadyExists'):
+                    raise
+        self.bucket_cache.add(bucket_name)
+        return bucket_name
+
+
+class DataIngestion(Runnable):
+    """Handle data ingestion into a specified bucket."""
+    def __init__(self, minio_manager, part_size=DEFAULT_PART_SIZE,
+                 max_in_flight_parts=DEFAULT_MAX_IN_FLIGHT_PARTS,
+                 bucket_manager=None, async_gate=async_gate, dedup=False,
+                 digest_index=None, codec=None, level=None, read_cache=None,
+                 segment_index=None):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f'part_size must be at least {MIN_PART_SIZE} bytes')
+        self.minio_client = minio_manager.get_client()
+        self.endpoint = client_endpoint(self.minio_client)
+        self.bucket_manager = bucket_manager or BucketManager(minio_manager)
+        self.async_gate = async_gate
+        self.dedup = dedup
+        self.digest_index = known_digests if digest_index is None else digest_index
+        get_codec(codec)
+        self.codec = codec
+        self.level = level
+        self.read_cache = read_cache
+        self.segment_index = known_segments if segment_index is None else segment_index
+        self.part_size = part_size
+        self.max_in_flight_parts = max_in_flight_parts
+        self._part_pool = ThreadPoolExecutor(
+            max_workers=max_in_flight_parts, thread_name_prefix='ingest-part'
+        )
+
+    def run(self, bucket_name, data, object_name, part_size=None, dedup=None,
+            codec=None, level=None):
+        """Ingest data into specified bucket.
+
+        `data` may be bytes, a file-like object or an iterator of bytes. Anything
+        larger than one part is streamed as a parallel multipart upload. With
+        dedup, the payload is stored once under its digest and object_name
+        becomes a pointer to it. A codec ('gzip', 'zstd' or 'none') compresses
+        the stored bytes; DataRetrieval decompresses them transparently.
+        """
+        try:
+            self.put(
+                bucket_name, object_name, data, part_size=part_size, dedup=dedup,
+                codec=codec, level=level,
+            )
+            logging.info(f'Data ingested to {bucket_name}/{object_name}.')
+        except Exception as e:
+            logging.error(f'Error in data ingestion: {str(e)}')
+        return object_name
+
+    async def arun(self, bucket_name, data, object_name, part_size=None, dedup=None,
+                   codec=None, level=None):
+        """Async variant of run; cancelling the task aborts a multipart upload."""
+        try:
+            await self.async_gate.call(
+                self.put, bucket_name, object_name, data,
+                part_size=part_size, dedup=dedup, codec=codec, level=level,
+            )
+            logging.info(f'Data ingested to {bucket_name}/{object_name}.')
+        except Exception as e:
+            logging.error(f'Error in data ingestion: {str(e)}')
+        return object_name
+
+    @traced('DataIngestion.put', payload=False)
+    def put(self, bucket_name, object_name, data, metadata=None, part_size=None,
+            dedup=None, codec=None, level=None, cancel_event=None):
+        """Upload data to bucket_name/object_name, raising on failure.
+
+        The key is dropped from read_cache afterwards, whether or not the
+        upload succeeded, and once it is stored it supersedes any packed copy.
+        """
+        data = tracer.counted(data)
+        part_size = part_size or self.part_size
+        codec = get_codec(codec or self.codec)
+        level = self.level if level is None else level
+        if codec is not None:
+            metadata = dict(metadata or {}, **{CODEC_HEADER: codec.name})
+        try:
+            if self.dedup if dedup is None else dedup:
+                result = self._put_deduplicated(
+                    bucket_name, object_name, data, metadata, part_size,
+                    codec, level, cancel_event,
+                )
+            else:
+                result = self._put_stream(
+                    bucket_name, object_name, data, metadata, part_size,
+                    codec, level, cancel_event,
+                )
+        finally:
+            self.invalidate_cached(bucket_name, object_name)
+        self.segment_index.discard(bucket_name, object_name)
+        return result
+
+    def invalidate_cached(self, bucket_name, object_name):
+        """Drop a key this ingestion changed from read_cache, if there is one."""
+        if self.read_cache is not None:
+            self.read_cache.invalidate(self.endpoint, bucket_name, object_name)
+
+    def _put_deduplicated(self, bucket_name, object_name, data, metadata, part_size,
+                          codec=None, level=None, cancel_event=None):
+        """Store data once under its sha256 and point object_name at it.
+
+        The payload is hashed while it is spooled to a local temporary file
+        (in memory up to one part), so a duplicate is detected before any
+        byte is sent and its upload is skipped entirely. The blob is written
+        again if the bucket has to be recreated for the pointer.
+        """
+        sha256 = hashlib.sha256()
+        size = 0
+        with tempfile.SpooledTemporaryFile(max_size=part_size) as spool:
+            for chunk in iter_parts(data, part_size):
+                check_cancelled(cancel_event)
+                sha256.update(chunk)
+                spool.write(chunk)
+                size += len(chunk)
+            digest = sha256.hexdigest()
+
+            def upload_blob():
+                spool.seek(0)
+                self._put_stream(
+                    bucket_name, blob_name(digest), spool, metadata, part_size,
+                    codec, level, cancel_event,
+                )
+                self.digest_index.add(self.endpoint, bucket_name, digest)
+
+            if self._has_blob(bucket_name, digest):
+                logging.info(f'Skipped upload of duplicate content sha256:{digest}.')
+            else:
+                upload_blob()
+            pointer = json.dumps(
+                {'digest': f'sha256:{digest}', 'blob': blob_name(digest), 'size': size}
+            ).encode()
+            return self._put_stream(
+                bucket_name, object_name, pointer, {BLOB_POINTER_HEADER: blob_name(digest)},
+                part_size, cancel_event=cancel_event, on_recreate=upload_blob,
+            )
+
+    def _has_blob(self, bucket_name, digest):
+        """Whether the digest index knows the blob and the bucket still holds it.
+
+        The index outlives blobs removed behind its back (a wiped or recreated
+        bucket, another client deleting), so a hit is confirmed with a HEAD.
+        """
+        if (self.endpoint, bucket_name, digest) not in self.digest_index:
+            return False
+        try:
+            self.minio_client.stat_object(bucket_name, blob_name(digest))
+        except S3Error as e:
+            if e.code not in ('NoSuchKey', 'NoSuchBucket'):
+                raise
+            logging.info(f'Blob sha256:{digest} is gone from {bucket_name}, uploading it again.')
+            self.digest_index.discard(self.endpoint, bucket_name, digest)
+            return False
+        return True
+
+    def _put_stream(self, bucket_name, object_name, data, metadata, part_size,
+                    codec=None, level=None, cancel_event=None, on_recreate=None):
+        if codec is not None:
+            data = compress_chunks(
+                iter_parts(data, DEFAULT_READ_CHUNK_SIZE), codec, level
+            )
+        parts = iter_parts(data, part_size)
+        first = next(parts, b'')
+        check_cancelled(cancel_event)
+        if len(first) < part_size:
+            return self._create_missing_bucket(
+                bucket_name, lambda: self.minio_client.put_object(
+                    bucket_name, object_name, BytesIO(first),
+                    length=len(first), metadata=metadata,
+                ), on_recreate,
+            )
+        return self._put_multipart(
+            bucket_name, object_name, first, parts, metadata, cancel_event, on_recreate
+        )
+
+    def _create_missing_bucket(self, bucket_name, request, on_recreate=None):
+        """Run request, creating the bucket and retrying once on NoSuchBucket.
+
+        Callers skip the bucket check when the bucket cache says it exists, so a
+        bucket deleted behind our back surfaces here instead. Its blobs went
+        with it, so they are dropped from the digest index, and on_recreate
+        runs before the retry to restore anything the request depends on.
+        """
+        try:
+            return request()
+        except S3Error as e:
+            if e.code != 'NoSuchBucket':
+                raise
+        logging.info(f'Bucket {bucket_name} missing, creating it and retrying.')
+        self.bucket_manager.bucket_cache.invalidate(bucket_name)
+        self.digest_index.discard(self.endpoint, bucket_name)
+        self.bucket_manager.run(bucket_name)
+        if on_recreate is not None:
+            on_recreate()
+        return request()
+
+    def _put_multipart(self, bucket_name, object_name, first, parts, metadata,
+                       cancel_event=None, on_recreate=None):
+        """Upload parts concurrently, holding at most max_in_flight_parts in memory."""
+        headers = {'Content-Type': 'application/octet-stream'}
+        headers.update(metadata_headers(metadata))
+        upload_id = self._create_missing_bucket(
+            bucket_name, lambda: self.minio_client._create_multipart_upload(
+                bucket_name, object_name, dict(headers)
+            ), on_recreate,
+        )
+        in_flight = threading.BoundedSemaphore(self.max_in_flight_parts)
+        errors = []
+        futures = []
+
+        def part_done(future):
+            in_flight.release()
+            if not future.cancelled() and future.exception() is not None:
+                errors.append(future.exception())
+
+        upload_part = in_context(self.minio_client._upload_part)
+        try:
+            part, part_number = first, 1
+            while part is not None:
+                in_flight.acquire()
+                if errors:
+                    in_flight.release()
+                    raise errors[0]
+                check_cancelled(cancel_event)
+                future = self._part_pool.submit(
+                    upload_part,
+                    bucket_name, object_name, part, None, upload_id, part_number,
+                )
+                future.add_done_callback(part_done)
+                futures.append((part_number, future))
+                part, part_number = next(parts, None), part_number + 1
+            uploaded = [Part(number, future.result()) for number, future in futures]
+            return self.minio_client._complete_multipart_upload(
+                bucket_name, object_name, upload_id, uploaded
+            )
+        except BaseException:
+            for _, future in futures:
+                future.cancel()
+            try:
+                self.minio_client._abort_multipart_upload(
+                    bucket_name, object_name, upload_id
+                )
+            except Exception as e:
+                logging.warning(f'Could not abort upload {upload_id}: {str(e)}')
+            raise
+
+
+class BatchIngestion(Runnable):
+    """Ingest many objects concurrently on a bounded thread pool."""
+    def __init__(self, bucket_manager, data_ingestion, max_workers=DEFAULT_BATCH_WORKERS):
+        self.bucket_manager = bucket_manager
+        self.data_ingestion = data_ingestion
+        self.max_workers = max_workers
+
+    def run(self, items, max_workers=None, dedup=None):
+        """Ingest (bucket_name, object_name, data) items, one result per item.
+
+        Results come back in input order as dicts with bucket_name,
+        object_name, etag and error. A failing item records its exception
+        instead of aborting the batch. Items are pulled from the iterable only
+        as workers free up, so generators of streams are not drained up front.
+        """
+        max_workers = max_workers or self.max_workers
+        window = threading.BoundedSemaphore(max_workers * 2)
+        futures = []
+        ingest_one = in_context(self._ingest_one)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest-batch') as pool:
+            for bucket_name, object_name, data in items:
+                window.acquire()
+                future = pool.submit(ingest_one, bucket_name, object_name, data, dedup)
+                future.add_done_callback(lambda _: window.release())
+                futures.append(future)
+        results = [future.result() for future in futures]
+        failed = sum(1 for result in results if result['error'] is not None)
+        logging.info(f'Batch ingested {len(results) - failed}/{len(results)} objects.')
+        return results
+
+    def _ingest_one(self, bucket_name, object_name, data, dedup=None):
+        result = {'bucket_name': bucket_name, 'object_name': object_name,
+                  'etag': None, 'error': None}
+        try:
+            self.bucket_manager.run(bucket_name)
+            result['etag'] = self.data_ingestion.put(
+                bucket_name, object_name, data, dedup=dedup
+            ).etag
+        except Exception as e:
+            logging.error(f'Error ingesting {bucket_name}/{object_name}: {str(e)}')
+            result['error'] = e
+        return result
+
+
+class IngestSpool(Runnable):
+    """Durable local write-ahead spool in front of DataIngestion.
+
+    run() writes the payload to `spool_dir` and returns as soon as it is
+    fsynced. A background flusher uploads entries in batches and retries with
+    exponential backoff while MinIO is unavailable. An entry is deleted only
+    after its upload succeeds, and entries left by a previous process are
+    picked up on start. Producers block once the spool holds `max_bytes`, so a
+    long outage applies backpressure instead of filling the disk.
+    """
+    def __init__(self, batch_ingestion, spool_dir, max_bytes=DEFAULT_SPOOL_MAX_BYTES,
+                 batch_size=DEFAULT_SPOOL_BATCH_SIZE, retry_delay=1.0, max_retry_delay=60.0,
+                 async_gate=async_gate):
+        self.batch_ingestion = batch_ingestion
+        self.async_gate = async_gate
+        self.spool_dir = spool_dir
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._cond = threading.Condition()
+        self._pending = collections.deque()
+        self._bytes = 0
+        self._seq = itertools.count()
+        self._closed = False
+        os.makedirs(spool_dir, exist_ok=True)
+        for name in sorted(os.listdir(spool_dir)):
+            path = os.path.join(spool_dir, name)
+            if name.endswith('.tmp'):
+                os.remove(path)
+            elif name.endswith('.entry'):
+                with open(path, 'rb') as f:
+                    header = json.loads(f.readline())
+                entry = (path, os.path.getsize(path), (header['bucket_name'], header['object_name']))
+                self._pending.append(entry)
+                self._bytes += entry[1]
+        if self._pending:
+            logging.info(f'Recovered {len(self._pending)} spooled ingests from {spool_dir}.')
+        self._flusher = threading.Thread(target=self._flush_loop, name='ingest-spool', daemon=True)
+        self._flusher.start()
+
+    def run(self, bucket_name, data, object_name, timeout=None):
+        """Spool data for bucket_name/object_name and return once it is durable."""
+        return self._spool(bucket_name, data, object_name, timeout)
+
+    async def arun(self, bucket_name, data, object_name, timeout=None):
+        """Async variant of run; cancelling the task abandons a partly written entry."""
+        return await self.async_gate.call(self._spool, bucket_name, data, object_name, timeout)
+
+    def _spool(self, bucket_name, data, object_name, timeout=None, cancel_event=None):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Ingest spool is closed.')
+            if not self._cond.wait_for(lambda: self._bytes < self.max_bytes, timeout):
+                raise TimeoutError(f'Ingest spool at {self.spool_dir} is full.')
+        entry = self._write_entry(bucket_name, object_name, data, cancel_event)
+        with self._cond:
+            self._pending.append(entry)
+            self._bytes += entry[1]
+            self._cond.notify_all()
+        logging.info(f'Data for {bucket_name}/{object_name} spooled.')
+        return object_name
+
+    def flush(self, timeout=None):
+        """Block until every spooled entry has been uploaded."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._bytes == 0, timeout)
+
+    def close(self, timeout=None):
+        """Stop accepting data and wait for the flusher to drain the spool.
+
+        Entries that cannot be uploaded before shutdown stay on disk and are
+        retried by the next IngestSpool on the same directory.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join(timeout)
+
+    def _write_entry(self, bucket_name, object_name, data, cancel_event=None):
+        name = f'{time.time_ns():020d}-{next(self._seq):08d}'
+        tmp_path = os.path.join(self.spool_dir, f'{name}.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                header = {'bucket_name': bucket_name, 'object_name': object_name}
+                f.write(json.dumps(header).encode() + b'\n')
+                for chunk in cancellable(iter_parts(data, DEFAULT_READ_CHUNK_SIZE), cancel_event):
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        path = os.path.join(self.spool_dir, f'{name}.entry')
+        os.replace(tmp_path, path)
+        self._fsync_dir()
+        return path, os.path.getsize(path), (bucket_name, object_name)
+
+    def _fsync_dir(self):
+        """Make the rename of a new entry durable, where directories can be fsynced."""
+        if os.name == 'nt':
+            return
+        fd = os.open(self.spool_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _flush_loop(self):
+        delay = self.retry_delay
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                batch = self._next_batch()
+            failed = self._upload(batch)
+            with self._cond:
+                self._pending.extendleft(reversed(failed))
+                self._bytes -= sum(entry[1] for entry in batch) - sum(entry[1] for entry in failed)
+                self._cond.notify_all()
+                if failed and self._closed:
+                    logging.warning(f'{len(self._pending)} spooled ingests left in {self.spool_dir}.')
+                    return
+            if failed:
+                logging.warning(f'{len(failed)} spooled ingests failed, retrying in {delay:.1f}s.')
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+            else:
+                delay = self.retry_delay
+
+    def _next_batch(self):
+        """Pop up to batch_size entries, stopping before a repeated key.
+
+        Uploads within a batch run concurrently, so two writes to the same key
+        must land in different batches to keep the last write winning.
+        """
+        batch, keys = [], set()
+        while self._pending and len(batch) < self.batch_size:
+            if self._pending[0][2] in keys:
+                break
+            keys.add(self._pending[0][2])
+            batch.append(self._pending.popleft())
+        return batch
+
+    def _upload(self, batch):
+        """Upload a batch of entries, returning the ones that failed."""
+        files = [open(entry[0], 'rb') for entry in batch]
+        try:
+            items = []
+            for f in files:
+                header = json.loads(f.readline())
+                items.append((header['bucket_name'], header['object_name'], f))
+            results = self.batch_ingestion.run(items)
+        finally:
+            for f in files:
+                f.close()
+        failed = []
+        for entry, result in zip(batch, results):
+            if result['error'] is None:
+                os.remove(entry[0])
+            else:
+                failed.append(entry)
+        return failed
+
+
+class SegmentPacker(Runnable):
+    """Pack many small payloads into indexed segment objects.
+
+    Payloads are buffered per bucket and written as one segment object plus a
+    compact JSON index once the buffer reaches `segment_size`, once it has
+    been open for `max_age` seconds, on flush(), or when the process exits.
+    The segment is written before its index, so readers never see members of
+    a partial segment, and a segment whose write fails goes back into the
+    buffer. Packed keys are readable through DataRetrieval, with one ranged
+    GET each, as soon as their segment has been written; other processes
+    pick up its index the first time they miss one of its keys.
+    """
+    def __init__(self, data_ingestion, segment_size=DEFAULT_SEGMENT_SIZE, segment_index=None,
+                 max_age=DEFAULT_SEGMENT_MAX_AGE):
+        self.data_ingestion = data_ingestion
+        self.segment_size = segment_size
+        self.segment_index = known_segments if segment_index is None else segment_index
+        self.max_age = max_age
+        self._open = {}
+        self._lock = threading.Lock()
+        live_packers.add(self)
+
+    def run(self, bucket_name, data, object_name):
+        """Add a small payload to the bucket's open segment.
+
+        Returns once the payload is buffered; flush() waits until it is stored.
+        """
+        data = b''.join(iter_parts(data, DEFAULT_READ_CHUNK_SIZE))
+        with self._lock:
+            buffer, members = self._open_segment(bucket_name)
+            members[object_name] = (len(buffer), len(data))
+            buffer += data
+            full = len(buffer) >= self.segment_size
+        if full:
+            self.flush(bucket_name)
+        return object_name
+
+    def flush(self, bucket_name=None):
+        """Write the open segment of one bucket, or of every bucket."""
+        with self._lock:
+            buckets = list(self._open) if bucket_name is None else [bucket_name]
+            segments = [(bucket, self._open.pop(bucket))
+                        for bucket in buckets if bucket in self._open]
+        for bucket, segment in segments:
+            self._write(bucket, segment)
+
+    def _open_segment(self, bucket_name):
+        """Return the bucket's open (buffer, members), starting one if needed.
+
+        Called with the lock held. A new segment gets a timer that writes it
+        after max_age seconds unless it has been written by then.
+        """
+        segment = self._open.get(bucket_name)
+        if segment is None:
+            segment = self._open[bucket_name] = (bytearray(), {})
+            if self.max_age is not None:
+                timer = threading.Timer(self.max_age, self._flush_aged, (bucket_name, segment))
+                timer.daemon = True
+                timer.start()
+        return segment
+
+    def _flush_aged(self, bucket_name, segment):
+        with self._lock:
+            if self._open.get(bucket_name) is not segment:
+                return
+            del self._open[bucket_name]
+        try:
+            self._write(bucket_name, segment)
+        except Exception as e:
+            logging.error(f'Error writing segment to {bucket_name}, will retry: {str(e)}')
+
+    def _write(self, bucket_name, segment):
+        buffer, members = segment
+        segment_id = f'{SEGMENT_PREFIX}{time.time_ns():020d}-{uuid.uuid4().hex[:8]}'
+        try:
+            # Members are byte ranges of the stored object, so segments and
+            # their indexes are always written verbatim.
+            self.data_ingestion.put(
+                bucket_name, f'{segment_id}.seg', bytes(buffer), codec='none', dedup=False
+            )
+            index = json.dumps(members, separators=(',', ':')).encode()
+            self.data_ingestion.put(
+                bucket_name, f'{segment_id}.idx', index, codec='none', dedup=False
+            )
+        except BaseException:
+            self._reopen(bucket_name, segment)
+            raise
+        self.segment_index.add(bucket_name, f'{segment_id}.seg', members)
+        for object_name in members:
+            self.data_ingestion.invalidate_cached(bucket_name, object_name)
+        logging.info(f'Packed {len(members)} objects into {bucket_name}/{segment_id}.seg.')
+
+    def _reopen(self, bucket_name, segment):
+        """Put a segment whose write failed back, ahead of payloads buffered since."""
+        with self._lock:
+            newer = self._open.pop(bucket_name, (bytearray(), {}))
+            buffer, members = self._open_segment(bucket_name)
+            for old_buffer, old_members in (segment, newer):
+                for object_name, (offset, length) in old_members.items():
+                    members[object_name] = (len(buffer) + offset, length)
+                buffer += old_buffer
+
+
+live_packers = weakref.WeakSet()
+
+
+def _flush_live_packers():
+    """Write the segments every SegmentPacker still buffers at exit."""
+    for packer in list(live_packers):
+        try:
+            packer.flush()
+        except Exception as e:
+            logging.error(f'Error writing packed objects at exit: {str(e)}')
+
+
+# Registered with threading rather than atexit so it runs before
+# concurrent.futures stops accepting work, which multipart uploads need.
+getattr(threading, '_register_atexit', atexit.register)(_flush_live_packers)
+
+
+def read_file_chunks(path, chunk_size=DEFAULT_READ_CHUNK_SIZE):
+    """Yield a local file in chunks, opening it lazily and closing it when done."""
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(chunk_size), b'')
+
+
+class DirectorySync(Runnable):
+    """Incrementally sync a local directory tree into a bucket, like rsync.
+
+    A manifest of {relative path: [size, mtime_ns, etag]} is kept under the
+    destination prefix. Each sync walks the tree, uploads in parallel only the
+    files whose size or mtime differ from the manifest, and optionally deletes
+    objects whose files are gone. An unchanged tree costs a stat per file plus
+    one GET and one PUT of the manifest.
+    """
+    def __init__(self, minio_manager, batch_ingestion, data_retrieval):
+        self.minio_client = minio_manager.get_client()
+        self.batch_ingestion = batch_ingestion
+        self.data_retrieval = data_retrieval
+
+    def run(self, local_dir, bucket_name, prefix='', delete=False, verify=False,
+            max_workers=None):
+        """Sync local_dir to bucket_name/prefix and return a summary dict.
+
+        With verify, the remote listing is compared against the manifest's
+        ETags too, so objects changed or removed behind the manifest's back are
+        uploaded again.
+        """
+        manifest = self._load_manifest(bucket_name, prefix)
+        local = self._scan(local_dir)
+        if verify:
+            listing = self.minio_client.list_objects(bucket_name, prefix=prefix, recursive=True)
+            remote = {obj.object_name[len(prefix):]: obj.etag for obj in listing}
+            manifest = {path: entry for path, entry in manifest.items()
+                        if remote.get(path) == entry[2]}
+        changed = [path for path, (size, mtime_ns) in local.items()
+                   if manifest.get(path, [None, None])[:2] != [size, mtime_ns]]
+        items = ((bucket_name, prefix + path, read_file_chunks(os.path.join(local_dir, path)))
+                 for path in changed)
+        failed = []
+        for path, result in zip(changed, self.batch_ingestion.run(items, max_workers=max_workers)):
+            if result['error'] is None:
+                manifest[path] = list(local[path]) + [result['etag']]
+            else:
+                failed.append(path)
+        removed = [path for path in manifest if path not in local]
+        deleted = 0
+        if delete and removed:
+            errors = self.minio_client.remove_objects(
+                bucket_name, (DeleteObject(prefix + path) for path in removed)
+            )
+            not_deleted = {error.name[len(prefix):] for error in errors}
+            for path in removed:
+                if path not in not_deleted:
+                    del manifest[path]
+                    deleted += 1
+                self._invalidate_cached(bucket_name, prefix + path)
+        self.batch_ingestion.data_ingestion.put(
+            bucket_name, prefix + SYNC_MANIFEST_NAME,
+            json.dumps(manifest, separators=(',', ':')).encode(),
+        )
+        self._invalidate_cached(bucket_name, prefix + SYNC_MANIFEST_NAME)
+        summary = {
+            'uploaded': len(changed) - len(failed),
+            'unchanged': len(local) - len(changed),
+            'deleted': deleted,
+            'failed': failed,
+        }
+        logging.info(f'Synced {local_dir} to {bucket_name}/{prefix}: {summary}.')
+        return summary
+
+    def _invalidate_cached(self, bucket_name, object_name):
+        # The manifest is read back through data_retrieval, whose cache need
+        # not be the one the ingestion side invalidates.
+        read_cache = self.data_retrieval.read_cache
+        if read_cache is not None:
+            read_cache.invalidate(self.data_retrieval.endpoint, bucket_name, object_name)
+
+    def _load_manifest(self, bucket_name, prefix):
+        try:
+            return json.loads(self.data_retrieval.read(bucket_name, prefix + SYNC_MANIFEST_NAME))
+        except S3Error as e:
+            if e.code not in ('NoSuchKey', 'NoSuchBucket'):
+                raise
+            return {}
+
+    @staticmethod
+    def _scan(local_dir):
+        """Map each file's '/'-separated relative path to (size, mtime_ns)."""
+        files = {}
+        for root, _, names in os.walk(local_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                files[os.path.relpath(path, local_dir).replace(os.sep, '/')] = (
+                    stat.st_size, stat.st_mtime_ns
+                )
+        return files
+
+
+def is_not_modified(error):
+    """True if a conditional GET failed only because the object is unchanged.
+
+    Depending on the response's content type, minio reports a 304 as a
+    ServerError or as an InvalidResponseError.
+    """
+    if isinstance(error, ServerError):
+        return error.status_code == 304
+    if isinstance(error, InvalidResponseError):
+        return getattr(error, '_code', None) == 304
+    return isinstance(error, S3Error) and error.code == 'NotModified'
+
+
+class ReadCache:
+    """Two-level read-through cache of whole objects for DataRetrieval.
+
+    Level one is an in-memory LRU bounded by `memory_bytes`, level two an
+    on-disk LRU under `cache_dir` bounded by `disk_bytes`. Entries are served
+    without touching MinIO for `fresh_for` seconds after they were last
+    validated; after that DataRetrieval revalidates them with a conditional
+    GET on their ETag. Hit, miss, revalidation (304), refresh (changed object)
+    and eviction counts are kept in `stats`.
+
+    Entries are keyed by endpoint (see client_endpoint) as well as bucket and
+    key, so one cache can serve agents on different MinIO deployments.
+    Writers that know about the cache invalidate the keys they overwrite or
+    delete; changes made elsewhere are picked up on revalidation.
+    """
+    def __init__(self, cache_dir=None, memory_bytes=DEFAULT_MEMORY_CACHE_BYTES,
+                 disk_bytes=DEFAULT_DISK_CACHE_BYTES, fresh_for=30.0):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.fresh_for = fresh_for
+        self.stats = collections.Counter()
+        self._memory = collections.OrderedDict()
+        self._memory_size = 0
+        self._disk = collections.OrderedDict()
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._load_disk()
+
+    def get(self, endpoint, bucket_name, object_name):
+        """Return (data, etag, fresh) for a cached object, or None."""
+        key = (endpoint, bucket_name, object_name)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                data, etag, validated_at = entry
+                return data, etag, time.monotonic() - validated_at < self.fresh_for
+            disk_entry = self._disk.get(key)
+            if disk_entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._disk.move_to_end(key)
+        path, _, etag, validated_at = disk_entry
+        try:
+            with open(path, 'rb') as f:
+                f.readline()
+                data = f.read()
+        except FileNotFoundError:
+            self.invalidate(endpoint, bucket_name, object_name)
+            self.stats['misses'] += 1
+            return None
+        self.stats['disk_hits'] += 1
+        self._remember(key, data, etag, validated_at)
+        return data, etag, time.monotonic() - validated_at < self.fresh_for
+
+    def put(self, endpoint, bucket_name, object_name, data, etag):
+        """Cache an object just fetched with the given ETag."""
+        key = (endpoint, bucket_name, object_name)
+        now = time.monotonic()
+        self._remember(key, data, etag, now)
+        if self.cache_dir and len(data) <= self.disk_bytes // 4:
+            path = os.path.join(
+                self.cache_dir,
+                hashlib.sha256(f'{endpoint}/{bucket_name}/{object_name}'.encode()).hexdigest(),
+            )
+            with open(f'{path}.tmp', 'wb') as f:
+                header = {'endpoint': endpoint, 'bucket_name': bucket_name,
+                          'object_name': object_name, 'etag': etag}
+                f.write(json.dumps(header).encode() + b'\n')
+                f.write(data)
+            os.replace(f'{path}.tmp', path)
+            with self._lock:
+                replaced = self._disk.pop(key, None)
+                if replaced is not None:
+                    self._disk_size -= replaced[1]
+                self._disk[key] = (path, len(data), etag, now)
+                self._disk_size += len(data)
+                while self._disk_size > self.disk_bytes:
+                    self._drop_disk(next(iter(self._disk)))
+
+    def revalidated(self, endpoint, bucket_name, object_name):
+        """Mark a cached object as confirmed current by a 304 response."""
+        key = (endpoint, bucket_name, object_name)
+        self.stats['revalidations'] += 1
+        with self._lock:
+            now = time.monotonic()
+            if key in self._memory:
+                data, etag, _ = self._memory[key]
+                self._memory[key] = (data, etag, now)
+            if key in self._disk:
+                path, size, etag, _ = self._disk[key]
+                self._disk[key] = (path, size, etag, now)
+
+    def invalidate(self, endpoint, bucket_name, object_name=None):
+        """Drop one object, or every object of a bucket when object_name is None."""
+        with self._lock:
+            for key in list(self._memory) + list(self._disk):
+                if key[:2] == (endpoint, bucket_name) and object_name in (None, key[2]):
+                    self._drop_memory(key, evicted=False)
+                    self._drop_disk(key, evicted=False)
+
+    def _remember(self, key, data, etag, validated_at):
+        if len(data) > self.memory_bytes // 4:
+            return
+        with self._lock:
+            self._drop_memory(key, evicted=False)
+            self._memory[key] = (data, etag, validated_at)
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes:
+                self._drop_memory(next(iter(self._memory)))
+
+    def _drop_memory(self, key, evicted=True):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_size -= len(entry[0])
+            self.stats['memory_evictions'] += evicted
+
+    def _drop_disk(self, key, evicted=True):
+        entry = self._disk.pop(key, None)
+        if entry is not None:
+            self._disk_size -= entry[1]
+            self.stats['disk_evictions'] += evicted
+            try:
+                os.remove(entry[0])
+            except FileNotFoundError:
+                pass
+
+    def _load_disk(self):
+        """Index files left by an earlier process, oldest first, as stale entries."""
+        paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)]
+        for path in sorted(paths, key=os.path.getmtime):
+            if path.endswith('.tmp'):
+                os.remove(path)
+                continue
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                size = os.path.getsize(path) - f.tell()
+            if 'endpoint' not in header:  # written before entries were keyed by endpoint
+                os.remove(path)
+                continue
+            key = (header['endpoint'], header['bucket_name'], header['object_name'])
+            self._disk[key] = (path, size, header['etag'], -self.fresh_for)
+            self._disk_size += size
+
+
+class HedgePolicy:
+    """Opt-in hedging of DataRetrieval GETs against slow MinIO nodes.
+
+    Time to first byte (until get_object returns with the response headers)
+    is tracked over the last `window` requests. Once `min_samples` have been
+    seen, a GET still waiting after the `percentile` of that distribution
+    (and at least min_delay seconds) gets a duplicate request, up to
+    max_hedges of them, and whichever responds first is used. Losing responses
+    are closed as they arrive. `stats` counts requests, hedges issued and
+    hedge wins, to tune the percentile against the extra load.
+    """
+    def __init__(self, percentile=95.0, min_delay=0.005, max_hedges=1, window=1000,
+                 min_samples=20, max_workers=DEFAULT_MAX_CONNECTIONS):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_hedges = max_hedges
+        self.min_samples = min_samples
+        self.stats = collections.Counter()
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedged-get')
+
+    def threshold(self):
+        """Seconds to wait before hedging, or None while still warming up."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        index = min(int(len(samples) * self.percentile / 100), len(samples) - 1)
+        return max(samples[index], self.min_delay)
+
+    def call(self, request):
+        """Run request(), hedging it if it is slow, and return the first response."""
+        delay = self.threshold()
+        start = time.monotonic()
+        request = in_context(request)
+        futures = [self._pool.submit(request)]
+        self.stats['requests'] += 1
+        done = set()
+        if delay is not None:
+            for _ in range(self.max_hedges):
+                done, _ = wait(futures, timeout=delay, return_when=FIRST_COMPLETED)
+                if done:
+                    break
+                futures.append(self._pool.submit(request))
+                self.stats['hedges'] += 1
+        if not done:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        winner = next(future for future in futures if future in done)
+        for future in futures:
+            if future is not winner:
+                future.add_done_callback(self._discard)
+        if winner is not futures[0]:
+            self.stats['hedge_wins'] += 1
+        response = winner.result()
+        with self._lock:
+            self._samples.append(time.monotonic() - start)
+        return response
+
+    @staticmethod
+    def _discard(future):
+        if not future.cancelled() and future.exception() is None:
+            response = future.result()
+            response.close()
+            response.release_conn()
+
+
+class DataRetrieval(Runnable):
+    """Handle data retrieval from a specified bucket."""
+    def __init__(self, minio_manager, async_gate=async_gate, segment_index=None,
+                 read_cache=None, hedge_policy=None, single_flight=inflight_reads):
+        self.minio_client = minio_manager.get_client()
+        self.endpoint = client_endpoint(self.minio_client)
+        self.async_gate = async_gate
+        self.segment_index = known_segments if segment_index is None else segment_index
+        self.read_cache = read_cache
+        self.hedge_policy = hedge_policy
+        self.single_flight = single_flight
+
+    def run(self, bucket_name, object_name):
+        """Retrieve data from specified bucket."""
+        data = self.read(bucket_name, object_name)
+        logging.info(f'Data retrieved from {bucket_name}/{object_name}.')
+        return data
+
+    async def arun(self, bucket_name, object_name):
+        """Async variant of run; cancelling every waiting task stops the download."""
+        data, _ = await self._coalesce_async(
+            (bucket_name, object_name, None),
+            lambda: self.async_gate.call(self._read, bucket_name, object_name),
+        )
+        logging.info(f'Data retrieved from {bucket_name}/{object_name}.')
+        return data
+
+    @traced('DataRetrieval.read')
+    def read(self, bucket_name, object_name, cancel_event=None):
+        """Download a whole object, releasing its connection afterwards.
+
+        Concurrent reads of the same key share one GET through single_flight.
+        With a read_cache, fresh cached copies are returned directly and stale
+        ones are revalidated with a conditional GET on their ETag.
+        """
+        return self.read_versioned(bucket_name, object_name, cancel_event)[0]
+
+    def read_versioned(self, bucket_name, object_name, cancel_event=None):
+        """Like read, but return (data, etag) with the ETag the data was served with."""
+        if cancel_event is not None:
+            # A cancellable leader would cancel its followers too.
+            return self._read(bucket_name, object_name, cancel_event)
+        return self._coalesce(
+            (bucket_name, object_name, None),
+            lambda: self._read(bucket_name, object_name),
+        )
+
+    def _coalesce(self, key, fn):
+        # single_flight is shared process-wide, and retrievals on different
+        # clients may reach different servers, so the client is part of the
+        # key. It stays alive, and its id unique, while the call is in flight.
+        if self.single_flight is None:
+            return fn()
+        return self.single_flight.do((id(self.minio_client),) + key, fn)
+
+    async def _coalesce_async(self, key, coro_fn):
+        if self.single_flight is None:
+            return await coro_fn()
+        return await self.single_flight.ado((id(self.minio_client),) + key, coro_fn)
+
+    def _read(self, bucket_name, object_name, cancel_event=None):
+        cached = None
+        if self.read_cache is not None:
+            cached = self.read_cache.get(self.endpoint, bucket_name, object_name)
+            if cached is not None and cached[2]:
+                return cached[0], cached[1]
+        try:
+            buffer = BytesIO()
+            with self.stream(bucket_name, object_name, cancel_event=cancel_event,
+                             if_none_match=cached and cached[1]) as chunks:
+                for chunk in chunks:
+                    buffer.write(chunk)
+        except (S3Error, ServerError, InvalidResponseError) as e:
+            if cached is None or not is_not_modified(e):
+                raise
+            self.read_cache.revalidated(self.endpoint, bucket_name, object_name)
+            return cached[0], cached[1]
+        data = buffer.getvalue()
+        if self.read_cache is not None and chunks.etag:
+            if cached is not None:
+                self.read_cache.stats['refreshes'] += 1
+            self.read_cache.put(self.endpoint, bucket_name, object_name, data, chunks.etag)
+        return data, chunks.etag
+
+    def stream(self, bucket_name, object_name, chunk_size=DEFAULT_READ_CHUNK_SIZE,
+               cancel_event=None, offset=0, length=None, tail=None, if_none_match=None):
+        """Return an ObjectStream yielding the object in chunks of about chunk_size.
+
+        offset/length or tail restrict the stream to a byte range, which is
+        served by a ranged GET. Packed keys are read from their segment with a
+        single ranged GET. Deduplicated keys are pointers; their blob is fetched
+        transparently, and objects written with a codec are decompressed as
+        they stream in. Ranges over compressed objects are cut from the
+        decompressed stream, which is read from the start. With if_none_match,
+        an unchanged object raises the client's not-modified error.
+        """
+        ranged = offset or length is not None or tail is not None
+        response, etag = self._get(
+            bucket_name, object_name, offset, length, tail, if_none_match
+        )
+        if response is None:
+            return ObjectStream(None, iter(()), etag=etag)
+        codec = get_codec(response.headers.get(CODEC_HEADER))
+        if codec is not None and ranged:
+            response.close()
+            response.release_conn()
+            response, etag = self._get(bucket_name, object_name)
+        chunks = response.stream(chunk_size)
+        if codec is not None:
+            chunks = decompress_chunks(chunks, codec)
+            if ranged:
+                chunks = slice_chunks(chunks, offset, length, tail)
+        if cancel_event is not None:
+            chunks = cancellable(chunks, cancel_event)
+        return ObjectStream(response, chunks, codec, etag)
+
+    def read_range(self, bucket_name, object_name, offset, length=None):
+        """Return length bytes starting at offset (to the end when length is None)."""
+        return self._coalesce(
+            (bucket_name, object_name, ('range', offset, length)),
+            lambda: self._join(
+                self.stream(bucket_name, object_name, offset=offset, length=length)
+            ),
+        )
+
+    def head(self, bucket_name, object_name, size):
+        """Return the first size bytes of an object."""
+        return self.read_range(bucket_name, object_name, 0, size)
+
+    def tail(self, bucket_name, object_name, size):
+        """Return the last size bytes of an object."""
+        return self._coalesce(
+            (bucket_name, object_name, ('tail', size)),
+            lambda: self._join(self.stream(bucket_name, object_name, tail=size)),
+        )
+
+    @staticmethod
+    def _join(stream):
+        with stream as chunks:
+            return b''.join(chunks)
+
+    def head_lines(self, bucket_name, object_name, count, encoding='utf-8',
+                   chunk_size=64 * 1024):
+        """Return the first count lines of a text object.
+
+        Fetches ranges of doubling size until enough lines have arrived, so a
+        preview of a multi-GB CSV transfers a few kilobytes.
+        """
+        lines, pending, offset = [], b'', 0
+        while len(lines) < count:
+            chunk = self.read_range(bucket_name, object_name, offset, chunk_size)
+            offset += len(chunk)
+            *complete, pending = (pending + chunk).split(b'\n')
+            lines.extend(complete)
+            if len(chunk) < chunk_size:
+                if pending:
+                    lines.append(pending)
+                break
+            chunk_size *= 2
+        return [line.decode(encoding).rstrip('\r') for line in lines[:count]]
+
+    def open(self, bucket_name, object_name, chunk_size=DEFAULT_READ_CHUNK_SIZE):
+        """Return a buffered, read-only file object over the object's contents.
+
+        Suitable for pandas, tokenizers or hashlib consumers that want to start
+        before the download finishes; close it (or use `with`) to release the
+        connection early.
+        """
+        return io.BufferedReader(
+            ObjectReader(self.stream(bucket_name, object_name, chunk_size)),
+            buffer_size=chunk_size,
+        )
+
+    def stat(self, bucket_name, object_name):
+        """Return (size in stored bytes, codec name or None) for a logical key."""
+        member, stat = self._locate(bucket_name, object_name)
+        if member is not None:
+            return member[2], None
+        blob = stat.metadata.get(BLOB_POINTER_HEADER)
+        if blob is not None:
+            stat = self.minio_client.stat_object(bucket_name, blob)
+        return stat.size, stat.metadata.get(CODEC_HEADER)
+
+    def version(self, bucket_name, object_name):
+        """Cheap identifier of a key's current contents, without reading them.
+
+        The ETag from a HEAD request, in the same form as the ETags of
+        list_objects results so either can key a cache, or the segment
+        position of a packed key. Raises S3Error NoSuchKey when the key is
+        gone.
+        """
+        member, stat = self._locate(bucket_name, object_name)
+        if member is not None:
+            return '{}@{}+{}'.format(*member)
+        return stat.etag
+
+    @traced('DataRetrieval.download', payload=False)
+    def download(self, bucket_name, object_name, dest=None,
+                 part_size=DEFAULT_DOWNLOAD_PART_SIZE, max_workers=DEFAULT_DOWNLOAD_WORKERS):
+        """Fetch a large object as concurrent ranged GETs and reassemble it in order.
+
+        dest may be None (the contents are returned as bytes), a file path or
+        a writable file object; for the latter two the byte count is returned.
+        The part count follows from the object size and part_size, capped at
+        max_workers in flight, so memory stays at max_workers * part_size.
+        Every range is pinned to the ETag seen up front with If-Match, so an
+        overwrite mid-download fails instead of mixing versions. Compressed
+        objects are fetched the same way and decompressed while reassembling.
+        """
+        member, stat = self._locate(bucket_name, object_name)
+        if member is not None:
+            data = self.read(bucket_name, object_name)
+            return self._write_chunks([tracer.counted(data, 'bytes_out')], dest)
+        blob = stat.metadata.get(BLOB_POINTER_HEADER)
+        if blob is not None:
+            object_name, stat = blob, self.minio_client.stat_object(bucket_name, blob)
+        parts = [(offset, min(part_size, stat.size - offset))
+                 for offset in range(0, stat.size, part_size)]
+        chunks = self._fetch_in_order(
+            bucket_name, object_name, stat.etag, parts, min(max_workers, len(parts) or 1)
+        )
+        codec = get_codec(stat.metadata.get(CODEC_HEADER))
+        if codec is not None:
+            chunks = decompress_chunks(chunks, codec)
+        logging.info(f'Downloading {bucket_name}/{object_name} in {len(parts)} parts.')
+        return self._write_chunks(tracer.counted(chunks, 'bytes_out'), dest)
+
+    def _locate(self, bucket_name, object_name):
+        """Return (segment member, None) for a packed key, else (None, its stat)."""
+        member = self.segment_index.get(bucket_name, object_name)
+        if member is not None:
+            return member, None
+        try:
+            return None, self.minio_client.stat_object(bucket_name, object_name)
+        except S3Error as e:
+            member = self._packed_elsewhere(bucket_name, object_name, e)
+            if member is None:
+                raise
+            return member, None
+
+    def _packed_elsewhere(self, bucket_name, object_name, error):
+        """Segment member for a key MinIO has no object for, or None.
+
+        The key may have been packed by another process, so segment indexes
+        written since the bucket was last loaded are read before giving up,
+        at most once per DEFAULT_SEGMENT_RELOAD_INTERVAL.
+        """
+        if getattr(error, 'code', None) != 'NoSuchKey':
+            return None
+        if not self.segment_index.refresh(self.minio_client, bucket_name):
+            return None
+        return self.segment_index.get(bucket_name, object_name)
+
+    def _fetch_in_order(self, bucket_name, object_name, etag, parts, max_workers):
+        """Yield ranged parts in order while up to max_workers are fetched ahead."""
+        def fetch(offset, length):
+            response = self._get_object(
+                bucket_name, object_name, offset=offset, length=length,
+                request_headers={'If-Match': f'"{etag}"'},
+            )
+            try:
+                return response.read()
+            finally:
+                response.close()
+                response.release_conn()
+
+        fetch = in_context(fetch)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='download-part') as pool:
+            window = collections.deque()
+            pending = iter(parts)
+            try:
+                for offset, length in itertools.islice(pending, max_workers):
+                    window.append(pool.submit(fetch, offset, length))
+                while window:
+                    part = window.popleft().result()
+                    for offset, length in itertools.islice(pending, 1):
+                        window.append(pool.submit(fetch, offset, length))
+                    yield part
+            finally:
+                for future in window:
+                    future.cancel()
+
+    @staticmethod
+    def _write_chunks(chunks, dest):
+        if dest is None:
+            return b''.join(chunks)
+        if isinstance(dest, (str, os.PathLike)):
+            with open(dest, 'wb') as f:
+                return DataRetrieval._write_chunks(chunks, f)
+        written = 0
+        for chunk in chunks:
+            dest.write(chunk)
+            written += len(chunk)
+        return written
+
+    @traced('minio.get_object')
+    def _get_object(self, bucket_name, object_name, **kwargs):
+        """get_object, hedged when a hedge_policy is configured."""
+        if self.hedge_policy is None:
+            return self.minio_client.get_object(bucket_name, object_name, **kwargs)
+        return self.hedge_policy.call(
+            lambda: self.minio_client.get_object(bucket_name, object_name, **kwargs)
+        )
+
+    def _get(self, bucket_name, object_name, offset=0, length=None, tail=None,
+             if_none_match=None):
+        """Issue the GET for a logical key and return (response, etag).
+
+        The response is None for an empty range. The ETag, and if_none_match,
+        belong to the logical key: the segment for packed keys, the pointer for
+        deduplicated ones, never a blob it points at.
+        """
+        if length == 0 or tail == 0:
+            return None, None
+        conditional = {'If-None-Match': f'"{if_none_match}"'} if if_none_match else None
+        member = self.segment_index.get(bucket_name, object_name)
+        if member is not None:
+            return self._get_member(bucket_name, member, offset, length, tail, conditional)
+        etag = None
+        while True:
+            try:
+                response = self._get_range(
+                    bucket_name, object_name, offset, length, tail, conditional
+                )
+            except S3Error as e:
+                if etag is not None:
+                    raise
+                member = self._packed_elsewhere(bucket_name, object_name, e)
+                if member is None:
+                    raise
+                return self._get_member(bucket_name, member, offset, length, tail, conditional)
+            conditional = None
+            if response is not None:
+                headers = response.headers
+            else:
+                # The range starts past the stored bytes. Pointers and
+                # compressed objects hold more than that, so look closer
+                # before reporting an empty range.
+                headers = self.minio_client.stat_object(bucket_name, object_name).metadata
+            if etag is None:
+                etag = headers.get('ETag', '').strip('"')
+            blob = headers.get(BLOB_POINTER_HEADER)
+            if blob is None:
+                break
+            if response is not None:
+                response.close()
+                response.release_conn()
+            object_name = blob
+        if response is None and headers.get(CODEC_HEADER):
+            response = self._get_object(bucket_name, object_name)
+        return response, etag
+
+    def _get_member(self, bucket_name, member, offset, length, tail, conditional):
+        segment_name, start, size = member
+        if tail is not None:
+            offset = max(size - tail, 0)
+        length = size - offset if length is None else min(length, size - offset)
+        if length <= 0:
+            return None, None
+        response = self._get_object(
+            bucket_name, segment_name, offset=start + offset, length=length,
+            request_headers=conditional,
+        )
+        return response, response.headers.get('ETag', '').strip('"')
+
+    def _get_range(self, bucket_name, object_name, offset, length, tail,
+                   request_headers=None):
+        request_headers = dict(request_headers or {})
+        if tail is not None:
+            request_headers['Range'] = f'bytes=-{tail}'
+        try:
+            return self._get_object(
+                bucket_name, object_name, offset=offset, length=length or 0,
+                request_headers=request_headers,
+            )
+        except S3Error as e:
+            # A range starting past the end of the object selects nothing.
+            if e.code == 'InvalidRange':
+                return None
+            raise
+
+
+class ObjectStream:
+    """Iterator over an object's chunks that owns the underlying HTTP response.
+
+    The pooled connection is released when the stream is exhausted, fails,
+    is closed, leaves a `with` block or is garbage collected.
+    """
+    def __init__(self, response, chunks, codec=None, etag=None):
+        self._response = response
+        self._chunks = chunks
+        self.codec = codec
+        self.etag = etag
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """Release the response's connection back to the pool."""
+        response, self._response = self._response, None
+        if response is not None:
+            response.close()
+            response.release_conn()
+
+
+class ObjectReader(io.RawIOBase):
+    """Raw file-like adapter over an ObjectStream."""
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._pending = memoryview(b'')
+
+    @property
+    def etag(self):
+        return self._chunks.etag
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._chunks.close()
+        super().close()
+
+
+class RangeFile(io.RawIOBase):
+    """Seekable read-only file over an object, where every read is a ranged GET.
+
+    Lets readers that seek (Parquet footers, Arrow IPC) fetch only the byte
+    ranges they need. Compressed objects are not seekable this way.
+    """
+    def __init__(self, data_retrieval, bucket_name, object_name, size):
+        self.data_retrieval = data_retrieval
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.size = size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self.size}[whence]
+        self._position = max(base + offset, 0)
+        return self._position
+
+    def readinto(self, buffer):
+        length = min(len(buffer), self.size - self._position)
+        if length <= 0:
+            return 0
+        data = self.data_retrieval.read_range(
+            self.bucket_name, self.object_name, self._position, length
+        )
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class Prefetcher(Runnable):
+    """Iterate a listing's objects in order while the next ones download.
+
+    Keeps up to `depth` objects downloading ahead of the consumer, as long as
+    their listed sizes fit in `max_bytes` (one object is always allowed, so
+    an oversized object still goes through). Bare object names carry no size
+    and are bounded by depth alone.
+    """
+    def __init__(self, data_retrieval, depth=DEFAULT_PREFETCH_DEPTH,
+                 max_bytes=DEFAULT_PREFETCH_BYTES, max_workers=None):
+        self.data_retrieval = data_retrieval
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers or depth
+
+    def run(self, bucket_name, objects=None, prefix=None):
+        """Yield (object_name, data) for objects, or for everything under prefix.
+
+        objects may hold names or the Object entries list_objects returns. A
+        prefix covers packed keys too, and skips this module's bookkeeping
+        objects.
+        """
+        if objects is None:
+            listed = (
+                obj for obj in self.data_retrieval.minio_client.list_objects(
+                    bucket_name, prefix=prefix, recursive=True
+                ) if not obj.is_dir and not is_internal_object(obj.object_name)
+            )
+            objects = self._with_packed(bucket_name, prefix or '', listed)
+        return self._prefetch(bucket_name, iter(objects))
+
+    def _with_packed(self, bucket_name, prefix, listed):
+        """Merge the keys packed under prefix into a listing, in name order."""
+        segment_index = self.data_retrieval.segment_index
+        segment_index.refresh(self.data_retrieval.minio_client, bucket_name)
+        packed = segment_index.keys(bucket_name, prefix)
+        shadowed = set(packed)  # reads of a packed key go to its segment
+        return heapq.merge(
+            (obj for obj in listed if obj.object_name not in shadowed), packed,
+            key=lambda entry: entry if isinstance(entry, str) else entry.object_name,
+        )
+
+    def _prefetch(self, bucket_name, objects):
+        window = collections.deque()
+        reserved = 0
+        upcoming = next(objects, None)
+        read = in_context(self.data_retrieval.read)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='prefetch') as pool:
+            try:
+                while window or upcoming is not None:
+                    while upcoming is not None and len(window) < self.depth:
+                        if isinstance(upcoming, str):
+                            name, size = upcoming, 0
+                        else:
+                            name, size = upcoming.object_name, upcoming.size or 0
+                        if window and reserved + size > self.max_bytes:
+                            break
+                        future = pool.submit(read, bucket_name, name)
+                        window.append((name, size, future))
+                        reserved += size
+                        upcoming = next(objects, None)
+                    name, size, future = window.popleft()
+                    data = future.result()
+                    reserved -= size
+                    yield name, data
+            finally:
+                for _, _, future in window:
+                    future.cancel()
+
+
+class ObjectListing(Runnable):
+    """List objects in a bucket."""
+    def __init__(self, minio_manager, async_gate=async_gate):
+        self.minio_client = minio_manager.get_client()
+        self.async_gate = async_gate
+
+    def run(self, bucket_name, prefix=None, recursive=True):
+        """List objects under prefix in specified bucket."""
+        return self.list(bucket_name, prefix=prefix, recursive=recursive)
+
+    async def arun(self, bucket_name, prefix=None, recursive=True):
+        """Async variant of run; cancelling the task stops paging."""
+        return await self.async_gate.call(
+            self.list, bucket_name, prefix=prefix, recursive=recursive
+        )
+
+    def list(self, bucket_name, prefix=None, recursive=True, cancel_event=None):
+        """Collect the listing, checking for cancellation between entries."""
+        objects = []
+        for obj in self.minio_client.list_objects(bucket_name, prefix=prefix, recursive=recursive):
+            check_cancelled(cancel_event)
+            objects.append(obj)
+        logging.info(f'Listed {len(objects)} objects in {bucket_name}/{prefix or ""}.')
+        return objects
+
+
+FILTER_OPERATORS = {
+    '==': lambda values, value: values == value,
+    '!=': lambda values, value: values != value,
+    '<': lambda values, value: values < value,
+    '<=': lambda values, value: values <= value,
+    '>': lambda values, value: values > value,
+    '>=': lambda values, value: values >= value,
+    'in': lambda values, value: values.isin(value),
+    'not in': lambda values, value: ~values.isin(value),
+}
+
+
+def apply_filters(df, filters):
+    """Keep the rows of df matching every (column, op, value) filter."""
+    if not filters:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        mask &= FILTER_OPERATORS[op](df[column], value)
+    return df[mask]
+
+
+def range_may_match(minimum, maximum, op, value):
+    """Whether values within [minimum, maximum] can satisfy `op value`.
+
+    Used to skip row groups or whole objects from their statistics; unknown
+    bounds (None) never rule anything out.
+    """
+    if minimum is None or maximum is None:
+        return True
+    try:
+        if op == '==':
+            return minimum <= value <= maximum
+        if op == '!=':
+            return not (minimum == maximum == value)
+        if op == '<':
+            return minimum < value
+        if op == '<=':
+            return minimum <= value
+        if op == '>':
+            return maximum > value
+        if op == '>=':
+            return maximum >= value
+        if op == 'in':
+            return any(minimum <= item <= maximum for item in value)
+    except TypeError:
+        pass
+    return True
+
+
+FORMAT_EXTENSIONS = {
+    '.parquet': 'parquet', '.pq': 'parquet',
+    '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow',
+    '.jsonl': 'jsonl', '.ndjson': 'jsonl',
+    '.csv': 'csv', '.tsv': 'tsv', '.txt': 'csv',
+}
+CSV_SEPARATORS = {'csv': ',', 'tsv': '\t'}
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+MAGIC_BYTES = [
+    (b'PAR1', ('parquet', None)),
+    (b'ARROW1', ('arrow', None)),
+    (b'\x1f\x8b', ('csv', 'gzip')),
+    (b'\x28\xb5\x2f\xfd', ('csv', 'zstd')),
+    (b'{', ('jsonl', None)),
+]
+
+
+def detect_format(object_name, head=None):
+    """Return (format, compression) from the name, or from magic bytes in head.
+
+    Formats are 'parquet', 'arrow', 'jsonl', 'csv' and 'tsv'; compression is None,
+    'gzip' or 'zstd' for files compressed before they were ingested.
+    """
+    name = object_name.lower()
+    compression = None
+    for extension, codec in COMPRESSION_EXTENSIONS.items():
+        if name.endswith(extension):
+            name, compression = name[:-len(extension)], codec
+    for extension, fmt in FORMAT_EXTENSIONS.items():
+        if name.endswith(extension):
+            return fmt, compression
+    for magic, (fmt, magic_compression) in MAGIC_BYTES:
+        if head and head.startswith(magic):
+            return fmt, compression or magic_compression
+    return 'csv', compression
+
+
+class ColumnStats:
+    """Min, max, null count and a HyperLogLog distinct estimate for one column.
+
+    Updated a chunk at a time with vectorized numpy operations; the distinct
+    estimate hashes values with pandas and keeps 2**HLL_PRECISION registers,
+    so memory stays fixed at a few kilobytes per column (about 1.6% error).
+    """
+    def __init__(self):
+        self.dtype = None
+        self.minimum = None
+        self.maximum = None
+        self.nulls = 0
+        self.ordered = True
+        self.registers = np.zeros(1 << HLL_PRECISION, dtype=np.uint8)
+
+    def update(self, series):
+        self.dtype = widen_dtype(self.dtype, str(series.dtype))
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return self
+        if self.ordered:
+            try:
+                minimum, maximum = values.min(), values.max()
+                self.minimum = minimum if self.minimum is None else min(self.minimum, minimum)
+                self.maximum = maximum if self.maximum is None else max(self.maximum, maximum)
+            except TypeError:  # mixed types have no order
+                self.ordered, self.minimum, self.maximum = False, None, None
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(np.uint64)
+        buckets = hashes >> np.uint64(64 - HLL_PRECISION)
+        rest = (hashes << np.uint64(HLL_PRECISION)) | np.uint64(1 << (HLL_PRECISION - 1))
+        ranks = 64 - np.frexp(rest.astype(np.float64))[1] + 1
+        np.maximum.at(self.registers, buckets.astype(np.intp), ranks.astype(np.uint8))
+        return self
+
+    def distinct(self):
+        """HyperLogLog estimate of the number of distinct non-null values."""
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.exp2(-self.registers.astype(float)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self):
+        return {
+            'dtype': self.dtype or 'object',
+            'min': json_scalar(self.minimum),
+            'max': json_scalar(self.maximum),
+            'nulls': self.nulls,
+            'distinct': self.distinct(),
+        }
+
+
+def json_scalar(value):
+    """A numpy/pandas scalar as a JSON-friendly value.
+
+    Timestamps, dates and durations become ISO strings, decimals strings.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, (pd.Timedelta, np.timedelta64, datetime.timedelta)):
+        return pd.Timedelta(value).isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class TableStats:
+    """Per-column ColumnStats for a whole object, built while it is read."""
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}
+
+    def update(self, df):
+        for column in df.columns:
+            self.columns.setdefault(column, ColumnStats()).update(df[column])
+        self.rows += len(df)
+        return self
+
+    def to_dict(self, version=None):
+        return {
+            'version': version,
+            'rows': self.rows,
+            'columns': {column: stats.to_dict() for column, stats in self.columns.items()},
+        }
+
+
+def stats_may_match(stats, filters):
+    """Whether an object with these sidecar stats can hold rows matching every filter."""
+    for column, op, value in filters or ():
+        column_stats = stats['columns'].get(column)
+        if column_stats is None:
+            continue
+        minimum, maximum = column_stats['min'], column_stats['max']
+        if column_stats['dtype'].startswith('datetime64') and minimum is not None:
+            minimum, maximum = pd.Timestamp(minimum), pd.Timestamp(maximum)
+        elif column_stats['dtype'].startswith('timedelta64') and minimum is not None:
+            minimum, maximum = pd.Timedelta(minimum), pd.Timedelta(maximum)
+        if column_stats['nulls'] == stats['rows'] and op not in ('!=', 'not in'):
+            return False  # nulls match only the negated filters
+        if not range_may_match(minimum, maximum, op, value):
+            return False
+    return True
+
+
+def downcast_numeric(series):
+    """Smallest integer or float dtype that holds series without losing values.
+
+    Floats only drop to float32 when every value survives the round trip.
+    """
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer' if series.min() < 0 else 'unsigned')
+    if pd.api.types.is_float_dtype(series):
+        narrowed = series.astype(np.float32)
+        if np.array_equal(narrowed.to_numpy(np.float64), series.to_numpy(), equal_nan=True):
+            return narrowed
+    return series
+
+
+def is_dtype_hint(dtype):
+    """Whether a dtypes hint to DataLoader.optimized() overrides dtype detection.
+
+    Only 'category', datetime64 and numeric hints do. 'object' and string
+    hints, which schema inference reports for every text column, do not.
+    """
+    if dtype is None:
+        return False
+    dtype = str(dtype)
+    if dtype == 'category' or dtype.startswith('datetime64'):
+        return True
+    try:
+        return pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(dtype))
+    except TypeError:
+        return False
+
+
+def is_iso_datetime(series):
+    """Whether every non-null value of a text column parses as an ISO 8601 timestamp."""
+    values = series.dropna()
+    if values.empty or not values.astype(str).str.match(r'\d{4}-\d{2}-\d{2}').all():
+        return False
+    try:
+        pd.to_datetime(values, format='ISO8601')
+    except (ValueError, TypeError):
+        return False
+    return True
+
+
+class DataLoader(Runnable):
+    """Load data into a Pandas DataFrame."""
+    def __init__(self, data_retrieval):
+        self.data_retrieval = data_retrieval
+
+    def run(self, bucket_name, object_name, chunksize=None, columns=None, filters=None,
+            format=None, optimize=False, dtypes=None, stats=False):
+        """Load data from specified object in bucket into DataFrame.
+
+        The format (CSV or TSV, optionally gzip/zstd compressed, JSON Lines,
+        Parquet or Arrow IPC) comes from `format`, the object's extension or
+        its magic bytes; compression always follows the extension. `columns` projects the result and `filters` is a list of
+        (column, op, value) row filters. Parquet skips row groups whose
+        statistics cannot match and reads only the needed column chunks
+        through ranged GETs. With chunksize, CSV and JSON Lines return an
+        iterator of DataFrames of that many rows instead, parsed while the
+        object streams in. optimize=True loads with compact dtypes instead;
+        see optimized(). stats=True also writes column statistics to a
+        <object_name>.stats.json sidecar in the same pass (whole-object reads
+        only: it is ignored when columns or filters are given).
+        """
+        # An explicit format still takes the compression from the name.
+        fmt, compression = detect_format(
+            object_name, None if format else self._sniff(bucket_name, object_name)
+        )
+        fmt = format or fmt
+        stats = stats and not (columns or filters)
+        if optimize:
+            return self.optimized(
+                bucket_name, object_name, columns=columns, filters=filters, dtypes=dtypes,
+                format=fmt, compression=compression, stats=stats,
+            )
+        if fmt in ('parquet', 'arrow'):
+            version = self._columnar_version(bucket_name, object_name) if stats else None
+            df = self._read_columnar(fmt, bucket_name, object_name, columns, filters)
+            if stats:
+                self.write_stats(bucket_name, object_name, TableStats().update(df), version)
+        elif chunksize:
+            return self.iter_chunks(
+                bucket_name, object_name, chunksize, columns, filters, fmt, compression, stats
+            )
+        elif fmt in CSV_SEPARATORS and not (compression or columns or filters):
+            data, version = self.data_retrieval.read_versioned(bucket_name, object_name)
+            data_buffer = BytesIO(data)
+            with tracer.span('pandas.read_csv') as span:
+                span.add(bytes_in=len(data))
+                df = pd.read_csv(data_buffer, sep=CSV_SEPARATORS[fmt])
+                span.add(bytes_out=payload_size(df))
+            if stats:
+                self.write_stats(bucket_name, object_name, TableStats().update(df), version)
+        else:
+            chunks = self.iter_chunks(
+                bucket_name, object_name, DEFAULT_CSV_CHUNKSIZE, columns, filters,
+                fmt, compression, stats,
+            )
+            df = pd.concat(list(chunks), ignore_index=True)
+        logging.info(f'Data loaded from {bucket_name}/{object_name} into DataFrame.')
+        return df
+
+    def iter_chunks(self, bucket_name, object_name, chunksize=DEFAULT_CSV_CHUNKSIZE,
+                    columns=None, filters=None, format='csv', compression=None, stats=False):
+        """Yield a CSV, TSV or JSON Lines object as DataFrames of chunksize rows.
+
+        Memory stays constant: rows are parsed while the object streams in,
+        and projection and filters are applied chunk by chunk. With stats,
+        the stats sidecar is written once the last chunk has been read.
+        """
+        needed = self._needed_columns(columns, filters)
+        table_stats = TableStats() if stats and needed is None and not filters else None
+        with self.data_retrieval.open(bucket_name, object_name) as f:
+            if format == 'jsonl':
+                reader = pd.read_json(f, lines=True, chunksize=chunksize, compression=compression)
+            else:
+                reader = pd.read_csv(
+                    f, sep=CSV_SEPARATORS.get(format, ','), chunksize=chunksize,
+                    usecols=needed, compression=compression,
+                )
+            with reader:
+                for chunk in reader:
+                    if table_stats is not None:
+                        table_stats.update(chunk)
+                    if format == 'jsonl' and needed is not None:
+                        chunk = chunk.reindex(columns=needed)
+                    chunk = apply_filters(chunk, filters)
+                    yield chunk[columns] if columns is not None else chunk
+            version = f.raw.etag
+        if table_stats is not None:
+            self.write_stats(bucket_name, object_name, table_stats, version)
+        logging.info(f'Data streamed from {bucket_name}/{object_name} in chunks.')
+
+    def write_stats(self, bucket_name, object_name, table_stats, version):
+        """Store table_stats as the object's <object_name>.stats.json sidecar.
+
+        version is the plain ETag, as listings report it, of the response the
+        statistics were computed from, so readers can tell when the sidecar
+        has gone stale even if the object was overwritten while it was read.
+        """
+        data = json.dumps(
+            table_stats.to_dict(version), separators=(',', ':'), default=str
+        ).encode()
+        self.data_retrieval.minio_client.put_object(
+            bucket_name, object_name + STATS_SUFFIX, BytesIO(data), len(data),
+            content_type='application/json',
+        )
+        logging.info(f'Column statistics for {bucket_name}/{object_name} written.')
+
+    def load_many(self, bucket_name, prefix=None, columns=None, filters=None,
+                  max_workers=DEFAULT_DOWNLOAD_WORKERS, **kwargs):
+        """Load and concatenate every object under prefix, skipping ones that cannot match.
+
+        An object is skipped without being opened when its stats sidecar is
+        current (its version matches the ETag in the listing) and some
+        filter's value lies outside that column's min/max. Other keyword
+        arguments go to run().
+        """
+        listing = {
+            obj.object_name: obj
+            for obj in self.data_retrieval.minio_client.list_objects(
+                bucket_name, prefix=prefix, recursive=True
+            )
+            if not obj.is_dir
+        }
+        candidates = [name for name in sorted(listing) if not is_internal_object(name)]
+
+        def may_match(object_name):
+            if not filters or object_name + STATS_SUFFIX not in listing:
+                return True
+            stats = json.loads(self.data_retrieval.read(bucket_name, object_name + STATS_SUFFIX))
+            # Both sides are plain ETags; see DataRetrieval.version.
+            if stats.get('version') != listing[object_name].etag:
+                return True
+            return stats_may_match(stats, filters)
+
+        def load(object_name):
+            return self.run(bucket_name, object_name, columns=columns, filters=filters, **kwargs)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            selected = [
+                name for name, keep
+                in zip(candidates, executor.map(in_context(may_match), candidates)) if keep
+            ]
+            frames = list(executor.map(in_context(load), selected))
+        logging.info(f'Loaded {len(selected)} of {len(candidates)} objects in '
+                     f'{bucket_name}/{prefix or ""}; the rest were pruned by column statistics.')
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def optimized(self, bucket_name, object_name, columns=None, filters=None, dtypes=None,
+                  categorical_ratio=0.5, chunksize=DEFAULT_CSV_CHUNKSIZE, format=None,
+                  compression=None, stats=False):
+        """Load a DataFrame with compact dtypes, converting one chunk at a time.
+
+        Integers and floats are downcast to the smallest dtype that keeps
+        their values, text columns that parse as ISO 8601 become datetime64,
+        and text columns with fewer than categorical_ratio distinct values
+        per row become categoricals (unioned across chunks). The first chunk
+        decides which text columns are dates or categories, unless `dtypes`
+        (e.g. SchemaInference.infer(...).to_dict()) names a column as
+        'category', 'datetime64[ns]' or a numeric dtype; other hints, such as
+        'object', leave the decision to the first chunk. Values of a date
+        column that do not parse in later chunks become NaT, with a warning.
+        The sizes before and after, and the per-column count of such values,
+        are in df.attrs['memory_report'].
+        """
+        if format is None:
+            format, compression = detect_format(object_name, self._sniff(bucket_name, object_name))
+        elif compression is None:
+            compression = detect_format(object_name)[1]
+        if format in ('parquet', 'arrow'):
+            stats = stats and not (columns or filters)
+            version = self._columnar_version(bucket_name, object_name) if stats else None
+            frame = self._read_columnar(format, bucket_name, object_name, columns, filters)
+            if stats:
+                self.write_stats(bucket_name, object_name, TableStats().update(frame), version)
+            chunks = iter([frame])
+        else:
+            chunks = self.iter_chunks(
+                bucket_name, object_name, chunksize, columns, filters, format, compression, stats
+            )
+        hints = dict(dtypes or {})
+        frames, categories, before, original = [], set(), 0, {}
+        coerced = collections.Counter()
+        for chunk in chunks:
+            if not frames:
+                original = {column: str(dtype) for column, dtype in chunk.dtypes.items()}
+                for column in chunk.columns:
+                    text = (pd.api.types.is_object_dtype(chunk[column])
+                            or pd.api.types.is_string_dtype(chunk[column]))
+                    if not text or is_dtype_hint(hints.get(column)):
+                        continue
+                    if is_iso_datetime(chunk[column]):
+                        hints[column] = 'datetime64[ns]'
+                    elif chunk[column].nunique() < categorical_ratio * max(len(chunk), 1):
+                        hints[column] = 'category'
+            before += int(chunk.memory_usage(deep=True).sum())
+            for column in chunk.columns:
+                hint = str(hints.get(column, ''))
+                if hint == 'category':
+                    categories.add(column)
+                    chunk[column] = chunk[column].astype('category')
+                elif hint.startswith('datetime64'):
+                    parsed = pd.to_datetime(chunk[column], format='ISO8601', errors='coerce')
+                    coerced[column] += int((parsed.isna() & chunk[column].notna()).sum())
+                    chunk[column] = parsed
+                else:
+                    chunk[column] = downcast_numeric(chunk[column])
+            frames.append(chunk)
+        if not frames:
+            return pd.DataFrame()
+        for column in categories:
+            # Chunks with different categories would concatenate to text.
+            union = pd.api.types.union_categoricals(
+                [frame[column] for frame in frames], ignore_order=True
+            ).categories
+            for frame in frames:
+                frame[column] = frame[column].cat.set_categories(union)
+        df = pd.concat(frames, ignore_index=True)
+        for column in df.columns:
+            if column not in categories:
+                df[column] = downcast_numeric(df[column])
+        after = int(df.memory_usage(deep=True).sum())
+        coerced = {column: count for column, count in coerced.items() if count}
+        if coerced:
+            logging.warning(f'Unparseable dates in {bucket_name}/{object_name} became NaT: '
+                            f'{coerced}.')
+        df.attrs['memory_report'] = {
+            'before_bytes': before,
+            'after_bytes': after,
+            'coerced_to_null': coerced,
+            'dtypes': {
+                column: [original.get(column), str(dtype)] for column, dtype in df.dtypes.items()
+            },
+        }
+        logging.info(f'Data loaded from {bucket_name}/{object_name} into DataFrame using '
+                     f'{after / 2**20:.1f} MiB instead of {before / 2**20:.1f} MiB.')
+        return df
+
+    def _sniff(self, bucket_name, object_name):
+        """Fetch leading bytes for format detection, only when the name is not enough."""
+        name = object_name.lower()
+        for extension in COMPRESSION_EXTENSIONS:
+            if name.endswith(extension):
+                name = name[:-len(extension)]
+        if name.endswith(tuple(FORMAT_EXTENSIONS)):
+            return None
+        return self.data_retrieval.head(bucket_name, object_name, 8)
+
+    def _columnar_version(self, bucket_name, object_name):
+        """Version for stats of a Parquet/Arrow read, taken before its ranged GETs.
+
+        Those GETs each carry their own ETag, so the version is read up front
+        instead: an overwrite mid-read leaves the sidecar stale, never wrong.
+        """
+        return self.data_retrieval.version(bucket_name, object_name)
+
+    @staticmethod
+    def _needed_columns(columns, filters):
+        if columns is None:
+            return None
+        return list(dict.fromkeys(list(columns) + [column for column, _, _ in filters or ()]))
+
+    def _read_columnar(self, fmt, bucket_name, object_name, columns, filters):
+        if pyarrow is None:
+            raise ValueError(f'Reading {fmt} requires the pyarrow package.')
+        size, codec = self.data_retrieval.stat(bucket_name, object_name)
+        if codec is None:
+            source = RangeFile(self.data_retrieval, bucket_name, object_name, size)
+        else:
+            source = BytesIO(self.data_retrieval.read(bucket_name, object_name))
+        needed = self._needed_columns(columns, filters)
+        if fmt == 'parquet':
+            parquet_file = pyarrow.parquet.ParquetFile(source)
+            row_groups = [
+                index for index in range(parquet_file.num_row_groups)
+                if self._row_group_may_match(parquet_file.metadata.row_group(index), filters)
+            ]
+            table = parquet_file.read_row_groups(row_groups, columns=needed)
+            logging.info(f'Read {len(row_groups)}/{parquet_file.num_row_groups} row groups '
+                         f'of {bucket_name}/{object_name}.')
+        else:
+            table = pyarrow.ipc.open_file(source).read_all()
+            if needed is not None:
+                table = table.select(needed)
+        df = apply_filters(table.to_pandas(), filters)
+        return df[columns] if columns is not None else df
+
+    @staticmethod
+    def _row_group_may_match(row_group, filters):
+        """Whether a Parquet row group's column statistics allow every filter."""
+        names = {row_group.column(i).path_in_schema: i for i in range(row_group.num_columns)}
+        for column, op, value in filters or ():
+            if column not in names:
+                continue
+            stats = row_group.column(names[column]).statistics
+            if stats is None or not stats.has_min_max:
+                continue
+            if not range_may_match(stats.min, stats.max, op, value):
+                return False
+        return True
+
+
+def widen_dtype(current, new):
+    """Smallest dtype name that holds values of both dtypes.
+
+    Numeric and boolean dtypes promote as numpy does (int64 + float64 is
+    float64); any other mismatch widens to object.
+    """
+    if current is None or current == new:
+        return new
+    try:
+        current_dtype, new_dtype = np.dtype(current), np.dtype(new)
+    except TypeError:
+        return 'object'
+    if current_dtype.kind in 'biuf' and new_dtype.kind in 'biuf':
+        return str(np.promote_types(current_dtype, new_dtype))
+    return 'object'
+
+
+class IncrementalSchema:
+    """Schema accumulated one DataFrame chunk at a time.
+
+    Tracks, per column, the widened dtype and the null count. A chunk in
+    which a column is entirely null says nothing about its type, so it only
+    adds to the null count.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}
+
+    def update(self, df):
+        """Fold one chunk into the schema."""
+        for column in self.columns:
+            if column not in df.columns:
+                self.columns[column]['nulls'] += len(df)
+        for column, dtype in df.dtypes.items():
+            stats = self.columns.setdefault(column, {'dtype': None, 'nulls': self.rows})
+            nulls = int(df[column].isna().sum())
+            stats['nulls'] += nulls
+            if nulls < len(df):
+                stats['dtype'] = widen_dtype(stats['dtype'], str(dtype))
+        self.rows += len(df)
+        return self
+
+    def merge(self, other):
+        """Fold another IncrementalSchema (e.g. from another file) into this one."""
+        for column, stats in self.columns.items():
+            if column not in other.columns:
+                stats['nulls'] += other.rows
+        for column, other_stats in other.columns.items():
+            stats = self.columns.setdefault(column, {'dtype': None, 'nulls': self.rows})
+            stats['nulls'] += other_stats['nulls']
+            if other_stats['dtype'] is not None:
+                stats['dtype'] = widen_dtype(stats['dtype'], other_stats['dtype'])
+        self.rows += other.rows
+        return self
+
+    def to_dict(self):
+        """{column: dtype name}, with never-populated columns as object."""
+        return {column: stats['dtype'] or 'object' for column, stats in self.columns.items()}
+
+    def state(self):
+        """JSON-serialisable rows and per-column stats, for SchemaCache."""
+        return {'rows': self.rows, 'columns': self.columns}
+
+    @classmethod
+    def from_state(cls, state):
+        schema = cls()
+        schema.rows = state['rows']
+        schema.columns = {column: dict(stats) for column, stats in state['columns'].items()}
+        return schema
+
+
+VALUE_KINDS = {'bool': 'boolean', 'int64': 'integer', 'float64': 'float', 'object': 'string'}
+
+
+def classify_values(values):
+    """Count how many raw string values parse as bool, int64, float64 or neither.
+
+    Nulls are not counted. Mirrors what read_csv would infer for the column.
+    """
+    values = values.dropna().astype(str).str.strip()
+    values = values[values != '']
+    is_bool = values.str.lower().isin(['true', 'false'])
+    is_int = values.str.fullmatch(r'[+-]?\d+') & ~is_bool
+    numbers = pd.to_numeric(values.where(~is_bool & ~is_int), errors='coerce')
+    is_float = numbers.notna() & ~is_int
+    return {
+        'bool': int(is_bool.sum()),
+        'int64': int(is_int.sum()),
+        'float64': int(is_float.sum()),
+        'object': int(len(values) - is_bool.sum() - is_int.sum() - is_float.sum()),
+    }
+
+
+def wilson_lower_bound(successes, total, confidence):
+    """Lower end of the Wilson score interval for a proportion."""
+    if total == 0:
+        return 0.0
+    z = statistics.NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    share = successes / total
+    denominator = 1 + z * z / total
+    centre = share + z * z / (2 * total)
+    margin = z * ((share * (1 - share) + z * z / (4 * total)) / total) ** 0.5
+    return max(0.0, (centre - margin) / denominator)
+
+
+def dtype_covers(dtype, kind):
+    """Whether values of kind fit in a column of dtype."""
+    return kind == dtype or (dtype == 'float64' and kind == 'int64') or dtype == 'object'
+
+
+class SampledSchema:
+    """Schema inferred from a sample, with per-column confidence.
+
+    Each column records the dominant type among sampled values, its share,
+    the Wilson lower bound on that share, and the outliers that force the
+    column to object. A column is ambiguous when too few non-null values
+    were sampled to bound the share above min_share.
+    """
+    def __init__(self, method, rows, columns):
+        self.method = method
+        self.rows = rows
+        self.columns = columns
+
+    @classmethod
+    def from_sample(cls, method, sample, confidence, min_share):
+        columns = {}
+        for column in sample.columns:
+            counts = classify_values(sample[column])
+            total = sum(counts.values())
+            coverage = {
+                'bool': counts['bool'],
+                'int64': counts['int64'],
+                'float64': counts['int64'] + counts['float64'],
+            }
+            best = max(coverage.values())
+            dominant = next(
+                (dtype for dtype, covered in coverage.items() if covered == best and best), 'object'
+            )
+            covered = coverage.get(dominant, total)
+            nulls = len(sample) - total
+            dtype = dominant if covered == total else 'object'
+            if nulls and dtype == 'int64':
+                dtype = 'float64'
+            elif nulls and dtype == 'bool':
+                dtype = 'object'
+            lower_bound = wilson_lower_bound(covered, total, confidence)
+            columns[column] = {
+                'dtype': dtype,
+                'dominant': dominant,
+                'share': covered / total if total else 0.0,
+                'confidence': lower_bound,
+                'samples': total,
+                'nulls': nulls,
+                'outliers': {
+                    kind: count for kind, count in counts.items()
+                    if count and not dtype_covers(dominant, kind)
+                },
+                'ambiguous': covered == total and lower_bound < min_share,
+            }
+        return cls(method, len(sample), columns)
+
+    @classmethod
+    def from_incremental(cls, method, schema):
+        columns = {
+            column: {
+                'dtype': dtype, 'dominant': dtype, 'share': 1.0, 'confidence': 1.0,
+                'samples': schema.rows, 'nulls': schema.columns.get(column, {}).get('nulls', 0),
+                'outliers': {}, 'ambiguous': False,
+            }
+            for column, dtype in schema.to_dict().items()
+        }
+        return cls(method, schema.rows, columns)
+
+    @property
+    def ambiguous(self):
+        return [column for column, stats in self.columns.items() if stats['ambiguous']]
+
+    def describe(self, column):
+        """One line such as 'int64 for 99.97% of 10000 sampled values, 3 string outliers'."""
+        stats = self.columns[column]
+        line = f"{stats['dominant']} for {stats['share']:.2%} of {stats['samples']} sampled values"
+        for kind, count in stats['outliers'].items():
+            line += f', {count} {VALUE_KINDS[kind]} outliers'
+        return line
+
+    def to_dict(self):
+        """{column: dtype name}, like IncrementalSchema.to_dict."""
+        return {column: stats['dtype'] for column, stats in self.columns.items()}
+
+    def to_incremental(self):
+        """The sampled dtypes and null counts as an IncrementalSchema, for merging."""
+        return IncrementalSchema.from_state({
+            'rows': self.rows,
+            'columns': {
+                column: {'dtype': stats['dtype'], 'nulls': stats['nulls']}
+                for column, stats in self.columns.items()
+            },
+        })
+
+
+class SchemaCache:
+    """Inferred schemas keyed by (bucket, key, mode) and the object version they describe.
+
+    An entry only answers for the version (ETag) it was stored with, so an
+    overwritten object misses and is re-inferred; callers drop entries for
+    deleted keys with invalidate(). Pass `path` to persist entries in SQLite
+    across runs, e.g. for a nightly job.
+    """
+    def __init__(self, path=None):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS schemas (bucket TEXT, key TEXT, mode TEXT, '
+                'version TEXT, state TEXT, PRIMARY KEY (bucket, key, mode))'
+            )
+            for bucket, key, mode, version, state in self._db.execute('SELECT * FROM schemas'):
+                self._entries[(bucket, key, mode)] = (version, state)
+
+    def get(self, bucket_name, object_name, version, mode='full'):
+        """Return the cached IncrementalSchema for this version, or None."""
+        entry = self._entries.get((bucket_name, object_name, mode))
+        if entry is None or entry[0] != version:
+            return None
+        return IncrementalSchema.from_state(json.loads(entry[1]))
+
+    def put(self, bucket_name, object_name, version, schema, mode='full'):
+        """Store schema as the answer for this version, replacing older ones."""
+        state = json.dumps(schema.state())
+        with self._lock:
+            self._entries[(bucket_name, object_name, mode)] = (version, state)
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO schemas VALUES (?, ?, ?, ?, ?)',
+                    (bucket_name, object_name, mode, version, state),
+                )
+                self._db.commit()
+
+    def invalidate(self, bucket_name, object_name):
+        """Drop every entry for a key, e.g. once it has been deleted."""
+        with self._lock:
+            for mode in [mode for bucket, key, mode in self._entries
+                         if (bucket, key) == (bucket_name, object_name)]:
+                del self._entries[(bucket_name, object_name, mode)]
+            if self._db is not None:
+                self._db.execute(
+                    'DELETE FROM schemas WHERE bucket = ? AND key = ?', (bucket_name, object_name)
+                )
+                self._db.commit()
+
+
+known_schemas = SchemaCache()
+
+
+def _flatbuffer_field(buffer, table, field, fmt):
+    """Field number `field` of the flatbuffer table at `table`, or None if absent.
+
+    Offset fields (fmt '<I') are returned resolved to absolute positions.
+    """
+    vtable = table - struct.unpack_from('<i', buffer, table)[0]
+    if 4 + 2 * field >= struct.unpack_from('<H', buffer, vtable)[0]:
+        return None
+    offset = struct.unpack_from('<H', buffer, vtable + 4 + 2 * field)[0]
+    if not offset:
+        return None
+    value = struct.unpack_from(fmt, buffer, table + offset)[0]
+    return table + offset + value if fmt == '<I' else value
+
+
+def arrow_file_rows(source, size):
+    """Row count of an Arrow IPC file from its footer and record batch headers.
+
+    Only the footer and the few hundred bytes of metadata in front of each
+    record batch are read, never the batch bodies, so a RangeFile source
+    costs one small ranged GET per batch.
+    """
+    source.seek(size - 10)
+    footer_size = struct.unpack('<i', source.read(4))[0]
+    source.seek(size - 10 - footer_size)
+    footer = source.read(footer_size)
+    root = struct.unpack_from('<I', footer)[0]
+    batches = _flatbuffer_field(footer, root, 3, '<I')  # Footer.recordBatches
+    rows = 0
+    for index in range(struct.unpack_from('<I', footer, batches)[0] if batches else 0):
+        # Block: offset (int64), metaDataLength (int32, then padding), bodyLength.
+        offset, metadata_size = struct.unpack_from('<qi', footer, batches + 4 + 24 * index)
+        source.seek(offset)
+        metadata = source.read(metadata_size)
+        start = 8 if metadata[:4] == b'\xff\xff\xff\xff' else 4  # continuation marker
+        message = metadata[start:]
+        header = _flatbuffer_field(message, struct.unpack_from('<I', message)[0], 2, '<I')
+        rows += _flatbuffer_field(message, header, 0, '<q') or 0  # RecordBatch.length
+    return rows
+
+
+class SchemaInference(Runnable):
+    """Infer schema from a Pandas DataFrame."""
+    def __init__(self, data_loader=None, schema_cache=known_schemas):
+        self.data_loader = data_loader
+        self.schema_cache = schema_cache
+
+    def run(self, df):
+        """Infer schema from DataFrame, or from an iterator of DataFrame chunks."""
+        if not isinstance(df, pd.DataFrame):
+            return self.incremental(df).to_dict()
+        schema = df.dtypes.to_dict()
+        logging.info('Schema inferred.')
+        return schema
+
+    def incremental(self, chunks):
+        """Merge dtypes and null counts across chunks into an IncrementalSchema."""
+        schema = IncrementalSchema()
+        for chunk in chunks:
+            schema.update(chunk)
+        logging.info(f'Schema inferred incrementally over {schema.rows} rows.')
+        return schema
+
+    def infer(self, bucket_name, object_name, sample=False, version=None):
+        """Return an object's IncrementalSchema, from the schema cache when unchanged.
+
+        A HEAD request supplies the object's version, so an unchanged object
+        costs one round trip and no download. Pass `version` (e.g. the ETag
+        from a listing) to skip even that. A deleted object's entries are
+        dropped before the error propagates.
+        """
+        mode = 'sample' if sample else 'full'
+        if self.schema_cache is None:
+            return self.infer_object(bucket_name, object_name, sample)
+        if version is None:
+            try:
+                version = self.data_loader.data_retrieval.version(bucket_name, object_name)
+            except S3Error as e:
+                if e.code == 'NoSuchKey':
+                    self.schema_cache.invalidate(bucket_name, object_name)
+                raise
+        schema = self.schema_cache.get(bucket_name, object_name, version, mode)
+        if schema is not None:
+            logging.info(f'Schema of {bucket_name}/{object_name} served from cache.')
+            return schema
+        schema = self.infer_object(bucket_name, object_name, sample)
+        self.schema_cache.put(bucket_name, object_name, version, schema, mode)
+        return schema
+
+    def infer_object(self, bucket_name, object_name, sample=False):
+        """Infer an object's IncrementalSchema without consulting the cache.
+
+        Parquet and Arrow use their footer; other formats are scanned in
+        chunks, or sampled when sample is set.
+        """
+        fmt, compression = detect_format(
+            object_name, self.data_loader._sniff(bucket_name, object_name)
+        )
+        if sample or fmt in ('parquet', 'arrow'):
+            return self.sample(bucket_name, object_name).to_incremental()
+        chunks = self.data_loader.iter_chunks(
+            bucket_name, object_name, format=fmt, compression=compression,
+        )
+        return self.incremental(chunks)
+
+    def sample(self, bucket_name, object_name, rows=DEFAULT_SAMPLE_ROWS, method=None,
+               strata=DEFAULT_SAMPLE_STRATA, confidence=0.99, min_share=0.99,
+               escalate=True, seed=None):
+        """Infer an object's schema from a sample of its rows; return a SampledSchema.
+
+        Parquet and Arrow IPC schemas come exactly from the file footer.
+        Plain CSV defaults to a 'stratified' sample: `strata` evenly spaced
+        ranged GETs of about rows/strata rows each, so a multi-GB file costs
+        a few megabytes. Compressed CSV and JSON Lines cannot be entered
+        mid-stream and use a 'reservoir' sample of `rows` rows over one
+        streaming pass. If a column is ambiguous (too few non-null values to
+        bound its type share above min_share at the given confidence) and
+        escalate is set, the whole object is scanned instead.
+        """
+        retrieval = self.data_loader.data_retrieval
+        fmt, compression = detect_format(
+            object_name, self.data_loader._sniff(bucket_name, object_name)
+        )
+        if fmt in ('parquet', 'arrow'):
+            schema = self._footer_schema(fmt, bucket_name, object_name)
+        else:
+            size, codec = retrieval.stat(bucket_name, object_name)
+            if method is None:
+                method = ('stratified' if fmt in CSV_SEPARATORS and not (compression or codec)
+                          else 'reservoir')
+            if method == 'stratified':
+                sample = self._stratified_sample(
+                    bucket_name, object_name, size, rows, strata, CSV_SEPARATORS[fmt]
+                )
+            else:
+                sample = self._reservoir_sample(
+                    bucket_name, object_name, fmt, compression, rows, random.Random(seed)
+                )
+            schema = SampledSchema.from_sample(method, sample, confidence, min_share)
+            if schema.ambiguous and escalate:
+                logging.info(f'Sample of {bucket_name}/{object_name} is ambiguous for '
+                             f'{schema.ambiguous}, scanning the whole object.')
+                chunks = self.data_loader.iter_chunks(
+                    bucket_name, object_name, format=fmt, compression=compression
+                )
+                schema = SampledSchema.from_incremental('full', self.incremental(chunks))
+        for column in schema.columns:
+            logging.info(f'{bucket_name}/{object_name} {column}: {schema.describe(column)}')
+        return schema
+
+    def _footer_schema(self, fmt, bucket_name, object_name):
+        if pyarrow is None:
+            raise ValueError(f'Reading {fmt} requires the pyarrow package.')
+        retrieval = self.data_loader.data_retrieval
+        size, codec = retrieval.stat(bucket_name, object_name)
+        if codec is None:
+            source = RangeFile(retrieval, bucket_name, object_name, size)
+        else:
+            source = BytesIO(retrieval.read(bucket_name, object_name))
+        if fmt == 'parquet':
+            parquet_file = pyarrow.parquet.ParquetFile(source)
+            arrow_schema, rows = parquet_file.schema_arrow, parquet_file.metadata.num_rows
+        else:
+            arrow_schema = pyarrow.ipc.open_file(source).schema
+            rows = arrow_file_rows(source, size if codec is None else len(source.getvalue()))
+        schema = IncrementalSchema()
+        schema.rows = rows
+        for column, dtype in arrow_schema.empty_table().to_pandas().dtypes.items():
+            schema.columns[column] = {'dtype': str(dtype), 'nulls': 0}
+        return SampledSchema.from_incremental('footer', schema)
+
+    def _stratified_sample(self, bucket_name, object_name, size, rows, strata, sep=','):
+        retrieval = self.data_loader.data_retrieval
+        probe = retrieval.read_range(bucket_name, object_name, 0, 64 * 1024)
+        lines = probe.split(b'\n')
+        names = pd.read_csv(BytesIO(lines[0]), sep=sep, nrows=0).columns.tolist()
+        line_bytes = max(len(probe) // max(len(lines) - 1, 1), 1)
+        per_stratum = -(-rows // strata)
+        window = per_stratum * line_bytes * 2 + len(lines[0]) + 1
+        if window * strata >= size:
+            offsets, window = [0], size
+        else:
+            step = (size - window) / (strata - 1) if strata > 1 else 0
+            offsets = [int(i * step) for i in range(strata)]
+
+        def fetch(offset):
+            data = retrieval.read_range(bucket_name, object_name, offset, window)
+            data = data[data.find(b'\n') + 1:]  # header, or the line cut by the range
+            if offset + window < size:
+                data = data[:data.rfind(b'\n') + 1]
+            frame = pd.read_csv(BytesIO(data), sep=sep, header=None, names=names, dtype=str,
+                                on_bad_lines='skip')
+            return frame if len(offsets) == 1 else frame.head(per_stratum)
+
+        with ThreadPoolExecutor(max_workers=min(DEFAULT_DOWNLOAD_WORKERS, len(offsets))) as executor:
+            frames = list(executor.map(in_context(fetch), offsets))
+        logging.info(f'Sampled {bucket_name}/{object_name} with {len(offsets)} ranged reads.')
+        return pd.concat(frames, ignore_index=True)
+
+    def _reservoir_sample(self, bucket_name, object_name, fmt, compression, rows, rng):
+        reservoir, keys = None, None
+        with self.data_loader.data_retrieval.open(bucket_name, object_name) as f:
+            if fmt == 'jsonl':
+                reader = pd.read_json(f, lines=True, dtype=False, compression=compression,
+                                      chunksize=DEFAULT_CSV_CHUNKSIZE)
+            else:
+                reader = pd.read_csv(f, sep=CSV_SEPARATORS.get(fmt, ','), dtype=str,
+                                     compression=compression, chunksize=DEFAULT_CSV_CHUNKSIZE)
+            with reader:
+                for chunk in reader:
+                    if fmt == 'jsonl':
+                        chunk = chunk.astype(object).where(chunk.notna()).map(
+                            lambda value: value if value is None or value != value else str(value)
+                        )
+                    chunk_keys = pd.Series([rng.random() for _ in range(len(chunk))])
+                    if reservoir is None:
+                        reservoir, keys = chunk.reset_index(drop=True), chunk_keys
+                    else:
+                        reservoir = pd.concat([reservoir, chunk], ignore_index=True)
+                        keys = pd.concat([keys, chunk_keys], ignore_index=True)
+                    keep = keys.nsmallest(rows).index
+                    reservoir = reservoir.loc[keep].reset_index(drop=True)
+                    keys = keys.loc[keep].reset_index(drop=True)
+        return reservoir if reservoir is not None else pd.DataFrame()
+
+
+def is_internal_object(object_name):
+    """Whether a key is bookkeeping written by this module rather than user data."""
+    return (object_name.startswith((CAS_PREFIX, SEGMENT_PREFIX))
+            or object_name.endswith((SYNC_MANIFEST_NAME, STATS_SUFFIX)))
+
+
+_schema_worker = None
+
+
+def _init_schema_worker(minio_config):
+    """Build one loader and inference stage per worker process."""
+    global _schema_worker
+    data_retrieval = DataRetrieval(MinioManager(**minio_config))
+    _schema_worker = SchemaInference(DataLoader(data_retrieval), schema_cache=None)
+
+
+def _infer_object_schema(bucket_name, object_name, sample, schema_inference=None):
+    """Worker body: (object_name, IncrementalSchema or None, error or None)."""
+    schema_inference = schema_inference or _schema_worker
+    try:
+        return object_name, schema_inference.infer_object(bucket_name, object_name, sample), None
+    except Exception as e:
+        return object_name, None, str(e)
+
+
+class BucketSchemaInference(Runnable):
+    """Infer one schema across every object under a bucket prefix.
+
+    Objects are parsed in a process pool so CSV parsing is not bound by the
+    GIL; each worker builds its own client from MinioManager.config.
+    Per-object schemas are merged with type widening, and a drift report
+    lists, in last-modified order, the objects that added, dropped or
+    changed columns relative to the object before them.
+    """
+    def __init__(self, minio_manager, object_listing, schema_inference, max_workers=None):
+        self.minio_manager = minio_manager
+        self.object_listing = object_listing
+        self.schema_inference = schema_inference
+        self.max_workers = max_workers or os.cpu_count()
+
+    def run(self, bucket_name, prefix=None, sample=False, max_workers=None, processes=True):
+        """Return {'schema', 'rows', 'objects', 'drift', 'errors'} for the prefix.
+
+        With sample=True each object is sampled (see SchemaInference.sample)
+        rather than read in full. processes=False runs the workers as
+        threads in this process, which suits small prefixes.
+        """
+        objects = [
+            obj for obj in self.object_listing.run(bucket_name, prefix=prefix)
+            if not obj.is_dir and not is_internal_object(obj.object_name)
+        ]
+        objects.sort(key=lambda obj: (obj.last_modified is None, obj.last_modified, obj.object_name))
+        cache, mode = self.schema_inference.schema_cache, 'sample' if sample else 'full'
+        cached = {}
+        if cache is not None:
+            for obj in objects:
+                schema = cache.get(bucket_name, obj.object_name, obj.etag, mode)
+                if schema is not None:
+                    cached[obj.object_name] = schema
+        names = [obj.object_name for obj in objects if obj.object_name not in cached]
+        max_workers = max(1, min(max_workers or self.max_workers, len(names) or 1))
+        if processes:
+            # Forked workers would inherit locks and pooled connections held
+            # by this process's threads; spawned ones build their own.
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_init_schema_worker,
+                initargs=(self.minio_manager.config,),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            worker = functools.partial(_infer_object_schema, bucket_name, sample=sample)
+            chunksize = max(1, len(names) // (max_workers * 8))
+        else:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            worker = in_context(functools.partial(
+                _infer_object_schema, bucket_name, sample=sample,
+                schema_inference=self.schema_inference,
+            ))
+            chunksize = 1
+        with executor:
+            results = {
+                object_name: (schema, error)
+                for object_name, schema, error in executor.map(worker, names, chunksize=chunksize)
+            }
+        etags = {obj.object_name: obj.etag for obj in objects}
+        for object_name, (schema, error) in results.items():
+            if cache is not None and error is None:
+                cache.put(bucket_name, object_name, etags[object_name], schema, mode)
+        logging.info(f'{len(cached)} of {len(objects)} schemas in {bucket_name}/{prefix or ""} '
+                     f'served from cache.')
+
+        merged, previous, drift, errors = IncrementalSchema(), None, [], {}
+        for obj in objects:
+            object_name = obj.object_name
+            schema, error = results.get(object_name) or (cached[object_name], None)
+            if error is not None:
+                errors[object_name] = error
+                continue
+            merged.merge(schema)
+            current = schema.to_dict()
+            if previous is not None:
+                change = {
+                    'object_name': object_name,
+                    'last_modified': obj.last_modified.isoformat() if obj.last_modified else None,
+                    'added': [column for column in current if column not in previous],
+                    'dropped': [column for column in previous if column not in current],
+                    'changed': {
+                        column: [previous[column], dtype] for column, dtype in current.items()
+                        if column in previous and previous[column] != dtype
+                    },
+                }
+                if change['added'] or change['dropped'] or change['changed']:
+                    drift.append(change)
+            previous = current
+        logging.info(f'Schema inferred across {len(objects) - len(errors)} objects in '
+                     f'{bucket_name}/{prefix or ""}; {len(drift)} drift events, '
+                     f'{len(errors)} errors.')
+        return {
+            'schema': merged.to_dict(),
+            'rows': merged.rows,
+            'objects': len(objects) - len(errors),
+            'drift': drift,
+            'errors': errors,
+        }
+
+
+class SchemaDefinitionGenerator(Runnable):
+    """Generate schema definition file from inferred schema."""
+    def run(self, schema, file_path, drift=None):
+        """Generate schema definition file, plus <file_path>.drift.json when drift is given."""
+        with open(file_path, 'w') as f:
+            for column, dtype in schema.items():
+                f.write(f'{column}: {dtype}\n')
+        if drift is not None:
+            with open(f'{file_path}.drift.json', 'w') as f:
+                json.dump(drift, f, indent=2)
+        logging.info(f'Schema definition generated at {file_path}.')
+        return file_path
+
+
+class LanguageLearningChain(Chain):
+    """Custom LLM chain for language learning."""
+    def __init__(self, model_name):
+        super().__init__()
+
+        self.add_runnable(LLM(
+            model_name=model_name,
+            input_key='input',
+            output_key='output'
+        ))
+
+
+class Pipeline:
+    """A compiled sequence of stages for one DataLakeAgent action.
+
+    A stage is a callable (or a Runnable, whose run is used), optionally
+    paired with an output name as (stage, output_name) so later stages can
+    take its result as an argument. Each stage's argument names are
+    resolved once, here, from its signature; a call then just picks those
+    names out of a per-request context dict seeded with the caller's
+    keyword arguments, and returns the last stage's result.
+
+    arun() runs the same stages from asyncio: a stage's own arun, or a
+    coroutine function stage, is awaited, and any other stage runs on the
+    event loop's default executor. Its arguments are resolved from the
+    signatures of those coroutine functions.
+    """
+    def __init__(self, name, stages):
+        self.name = name
+        self.stages = []
+        self.async_stages = []
+        self.accepted = set()
+        self.async_accepted = set()
+        self.open = False  # some stage takes **kwargs, so any argument is fine
+        self.async_open = False
+        for stage in stages:
+            stage, output = stage if isinstance(stage, tuple) else (stage, None)
+            fn = getattr(stage, 'run', stage)
+            names, var_keyword = self._parameters(fn)
+            label = getattr(fn, '__qualname__', type(fn).__name__)
+            self.stages.append((fn, names, var_keyword, output, label))
+            self.accepted.update(names)
+            self.open = self.open or var_keyword
+            async_fn = getattr(stage, 'arun', stage)
+            blocking = not inspect.iscoroutinefunction(async_fn)
+            if blocking:
+                async_fn = fn
+            else:
+                names, var_keyword = self._parameters(async_fn)
+            self.async_stages.append((async_fn, names, var_keyword, output, label, blocking))
+            self.async_accepted.update(names)
+            self.async_open = self.async_open or var_keyword
+
+    @staticmethod
+    def _parameters(fn):
+        """The keyword-bindable parameter names of fn and whether it takes **kwargs."""
+        try:
+            parameters = inspect.signature(fn).parameters.values()
+        except (TypeError, ValueError):  # no introspectable signature
+            return (), True
+        names = tuple(
+            parameter.name for parameter in parameters
+            if parameter.kind in (parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY)
+        )
+        return names, any(parameter.kind is parameter.VAR_KEYWORD for parameter in parameters)
+
+    def run(self, **context):
+        """Run every stage against a fresh context built from the keyword arguments.
+
+        While the module tracer is enabled, the action and each stage are
+        recorded as nested spans.
+        """
+        if not self.open and not context.keys() <= self.accepted:
+            unexpected = sorted(context.keys() - self.accepted)
+            raise TypeError(f'{self.name} got unexpected arguments: {unexpected}')
+        if tracer.enabled:
+            return self._run_traced(context)
+        result = None
+        for fn, names, var_keyword, output, _ in self.stages:
+            if var_keyword:
+                result = fn(**context)
+            else:
+                result = fn(**{name: context[name] for name in names if name in context})
+            if output is not None:
+                context[output] = result
+        return result
+
+    def _run_traced(self, context):
+        result = None
+        with tracer.span(f'action:{self.name}'):
+            for fn, names, var_keyword, output, label in self.stages:
+                arguments = context if var_keyword else {
+                    name: context[name] for name in names if name in context
+                }
+                with tracer.span(label) as span:
+                    span.add(bytes_in=sum(map(payload_size, arguments.values())))
+                    result = fn(**arguments)
+                    span.add(bytes_out=payload_size(result))
+                if output is not None:
+                    context[output] = result
+        return result
+
+    async def arun(self, **context):
+        """Async counterpart of run, traced the same way while the tracer is enabled."""
+        if not self.async_open and not context.keys() <= self.async_accepted:
+            unexpected = sorted(context.keys() - self.async_accepted)
+            raise TypeError(f'{self.name} got unexpected arguments: {unexpected}')
+        loop = asyncio.get_running_loop()
+        result = None
+        with tracer.span(f'action:{self.name}'):
+            for fn, names, var_keyword, output, label, blocking in self.async_stages:
+                arguments = context if var_keyword else {
+                    name: context[name] for name in names if name in context
+                }
+                with tracer.span(label) as span:
+                    if tracer.enabled:
+                        span.add(bytes_in=sum(map(payload_size, arguments.values())))
+                    if blocking:
+                        result = await loop.run_in_executor(
+                            None, in_context(functools.partial(fn, **arguments))
+                        )
+                    else:
+                        result = await fn(**arguments)
+                    if tracer.enabled:
+                        span.add(bytes_out=payload_size(result))
+                if output is not None:
+                    context[output] = result
+        return result
+
+
+ACTIONS = {}
+
+
+def register_action(name, build=None):
+    """Register build(agent) -> stages as the pipeline for action `name`.
+
+    Plugins use this (also as a decorator) to add or replace actions;
+    agents compile every registered action once, when they are created.
+    Use DataLakeAgent.register for a single, existing agent.
+    """
+    if build is None:
+        return functools.partial(register_action, name)
+    ACTIONS[name] = build
+    return build
+
+
+class DataLakeAgent(Runnable):
+    """Agent to coordinate data lake operations."""
+    def __init__(self, minio_manager, spool_dir=None, read_cache=None, hedge_policy=None,
+                 schema_cache=known_schemas):
+        self.minio_manager = minio_manager
+        self.memory = Memory()
+        self.bucket_manager = BucketManager(minio_manager)
+        self.data_ingestion = DataIngestion(
+            minio_manager, bucket_manager=self.bucket_manager, read_cache=read_cache
+        )
+        self.batch_ingestion = BatchIngestion(self.bucket_manager, self.data_ingestion)
+        self.ingest_spool = IngestSpool(self.batch_ingestion, spool_dir) if spool_dir else None
+        self.segment_packer = SegmentPacker(self.data_ingestion)
+        self.data_retrieval = DataRetrieval(
+            minio_manager, read_cache=read_cache, hedge_policy=hedge_policy
+        )
+        self.object_listing = ObjectListing(minio_manager)
+        self.prefetcher = Prefetcher(self.data_retrieval)
+        self.directory_sync = DirectorySync(
+            minio_manager, self.batch_ingestion, self.data_retrieval
+        )
+        self.data_loader = DataLoader(self.data_retrieval)
+        self.schema_inference = SchemaInference(self.data_loader, schema_cache)
+        self.bucket_schema_inference = BucketSchemaInference(
+            minio_manager, self.object_listing, self.schema_inference,
+        )
+        self.schema_definition_generator = SchemaDefinitionGenerator()
+        self.language_learning_chain = LanguageLearningChain('your-llm-model-name')
+        self.pipelines = {}
+        for name, build in ACTIONS.items():
+            self.register(name, build(self))
+
+    def register(self, name, stages):
+        """Compile stages as this agent's pipeline for action `name`."""
+        self.pipelines[name] = Pipeline(name, stages)
+
+    def run(self, action, **kwargs):
+        """Coordinate operations based on specified action."""
+        pipeline = self.pipelines.get(action)
+        if pipeline is None:
+            raise ValueError(f"Unknown action: {action}")
+        return pipeline.run(**kwargs)
+
+    async def arun(self, action, **kwargs):
+        """Async counterpart of run; see Pipeline.arun for how stages are awaited."""
+        pipeline = self.pipelines.get(action)
+        if pipeline is None:
+            raise ValueError(f"Unknown action: {action}")
+        return await pipeline.arun(**kwargs)
+
+    def flush(self, timeout=None):
+        """Write buffered packed objects and wait until every spooled ingest is uploaded.
+
+        Returns False if timeout ran out before the spool drained.
+        """
+        self.segment_packer.flush()
+        if self.ingest_spool is None:
+            return True
+        return self.ingest_spool.flush(timeout)
+
+    def close(self, timeout=None):
+        """Stop accepting spooled ingests and wait for the spool to drain.
+
+        Entries that cannot be uploaded in time stay on disk and are uploaded
+        by the next agent on the same spool_dir. Buffered packed objects are
+        written first.
+        """
+        self.segment_packer.flush()
+        if self.ingest_spool is not None:
+            self.ingest_spool.close(timeout)
+
+    def _generate_schema(self, **kwargs):
+        """Schema of one object, or of every object under a prefix without object_name.
+
+        chunksize is no longer accepted and raises TypeError: inference
+        streams objects in DEFAULT_CSV_CHUNKSIZE-row chunks on its own.
+        """
+        if 'object_name' in kwargs:
+            return self.pipelines['generate_object_schema'].run(**kwargs)
+        return self.pipelines['generate_bucket_schema'].run(**kwargs)
+
+    def _write_bucket_schema(self, report, file_path):
+        self.schema_definition_generator.run(report['schema'], file_path, report['drift'])
+        return report
+
+    def _load_memory(self, **kwargs):
+        return self.memory.load_memory_variables(kwargs)
+
+
+register_action('ingest', lambda agent: (
+    [agent.ingest_spool] if agent.ingest_spool is not None
+    else [agent.bucket_manager, agent.data_ingestion]
+))
+register_action('ingest_batch', lambda agent: [agent.batch_ingestion])
+register_action('flush', lambda agent: [agent.flush])
+register_action('close', lambda agent: [agent.close])
+register_action('ingest_packed', lambda agent: [agent.segment_packer])
+register_action('retrieve', lambda agent: [agent.data_retrieval])
+register_action('download', lambda agent: [agent.data_retrieval.download])
+register_action('list', lambda agent: [agent.object_listing])
+register_action('prefetch', lambda agent: [agent.prefetcher])
+register_action('sync', lambda agent: [agent.directory_sync])
+register_action('generate_schema', lambda agent: [agent._generate_schema])
+register_action('generate_object_schema', lambda agent: [
+    (agent.schema_inference.infer, 'schema'),
+    (lambda schema: schema.to_dict(), 'schema'),
+    agent.schema_definition_generator,
+])
+register_action('generate_bucket_schema', lambda agent: [
+    (agent.bucket_schema_inference, 'report'),
+    agent._write_bucket_schema,
+])
+register_action('learn_language', lambda agent: [
+    agent._load_memory,
+    agent.language_learning_chain,
+])
+
+if __name__ == '__main__':
+    # Usage example:
+    minio_manager = MinioManager()
+    agent = DataLakeAgent(minio_manager)
+
+    # Ingest data
+    agent.run('ingest', bucket_name='example_bucket', data=b'sample data', object_name='data.txt')
+
+    # Ingest a batch of objects concurrently
+    agent.run('ingest_batch', items=[
+        ('example_bucket', f'part-{i}.txt', f'sample data {i}'.encode()) for i in range(10)
+    ])
+
+    # Generate schema
+    agent.run('generate_schema', bucket_name='example_bucket', object_name='data.txt', file_path='schema.txt')
+
+    # Learn language using custom LLM chain
+    agent.run('learn_language', input='input text')
+
+    # Prompt and Prompt Template:
+    from langchain.prompts import PromptTemplate
+
+    # Define a prompt template
+    prompt_template = PromptTemplate.from_template(
+        "You are a DataLakeAgent capable of ingesting data, retrieving data, generating schema, "
+        "and learning language. Your actions are governed by the instructions provided here. "
+        "Now, {action} with the following parameters: {parameters}."
+    )
+
+    # Format the prompt template with specific instructions
+    prompt = prompt_template.format(action='ingest', parameters={
+        'bucket_name': 'example_bucket',
+        'data': 'sample data',
+        'object_name': 'data.txt'
+    })
+
+    # The generated prompt can be passed to the DataLakeAgent
+    # agent.run() method can be modified to accept a prompt argument and parse it for instructions
@@ -0,0 +1,79 @@
+"""Compare per-ingest MinIO round trips with and without the bucket cache.
+
+Runs against an in-process stand-in for MinIO that sleeps for `--latency`
+seconds per request, so the numbers reflect request count rather than disk
+or network speed. Run it from the repository root, so DataLakeAgent is
+importable:
+
+    python -m benchmarks.bucket_cache --ingests 2000 --latency 0.001
+"""
+import argparse
+import logging
+import time
+from io import BytesIO
+
+from DataLakeAgent import BucketCache, BucketManager, DataIngestion
+
+
+class SlowMinio:
+    """Minimal MinIO stand-in that counts requests and adds fixed latency."""
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self.buckets = set()
+
+    def _request(self):
+        self.requests += 1
+        time.sleep(self.latency)
+
+    def bucket_exists(self, bucket_name):
+        self._request()
+        return bucket_name in self.buckets
+
+    def make_bucket(self, bucket_name):
+        self._request()
+        self.buckets.add(bucket_name)
+
+    def put_object(self, bucket_name, object_name, data, length, metadata=None):
+        self._request()
+        data.read(length)
+
+
+class SlowMinioManager:
+    def __init__(self, latency):
+        self.client = SlowMinio(latency)
+
+    def get_client(self):
+        return self.client
+
+
+def ingest(ingests, latency, ttl):
+    """Run `ingests` bucket-check + put pairs, returning (seconds, requests)."""
+    minio_manager = SlowMinioManager(latency)
+    bucket_manager = BucketManager(minio_manager, bucket_cache=BucketCache(ttl=ttl))
+    data_ingestion = DataIngestion(minio_manager, bucket_manager=bucket_manager)
+    start = time.perf_counter()
+    for i in range(ingests):
+        bucket_manager.run('bench')
+        data_ingestion.put('bench', f'object-{i}', BytesIO(b'x' * 512))
+    return time.perf_counter() - start, minio_manager.client.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ingests', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.001)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    uncached = ingest(args.ingests, args.latency, ttl=0)
+    cached = ingest(args.ingests, args.latency, ttl=300)
+    for label, (seconds, requests) in (('uncached', uncached), ('cached', cached)):
+        print(f'{label:>9}: {requests:6d} requests  {seconds:7.3f}s  '
+              f'{args.ingests / seconds:9.1f} ingests/s')
+    print(f'  savings: {1 - cached[1] / uncached[1]:.0%} of requests, '
+          f'{1 - cached[0] / uncached[0]:.0%} of wall time')
+
+
+if __name__ == '__main__':
+    main()
@@ -24,6 +24,10 @@ setup(
         'minio',
         'langchain',
     ],
+    extras_require={
+        'zstd': ['zstandard'],
+        'columnar': ['pyarrow'],
+    },
     entry_points={
         'console_scripts': [
             # define console scripts if any
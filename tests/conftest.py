@@ -0,0 +1,359 @@
+"""In-process stand-in for MinIO shared by the test suite.
+
+FakeMinio implements the subset of the minio-py client that DataLakeAgent
+uses, including the multipart primitives, ranged and conditional GETs, and
+the errors minio-py raises for them. Calls are counted in `requests`. The
+fixtures and helpers below build agent components on top of it and are
+shared by the per-feature test modules.
+
+Run the suite from the repository root with `python -m pytest`.
+"""
+import collections
+import datetime
+import hashlib
+import itertools
+import threading
+import time
+import uuid
+from io import BytesIO
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from minio.error import InvalidResponseError, S3Error, ServerError
+from urllib3._collections import HTTPHeaderDict
+
+from DataLakeAgent import (
+    BucketCache, BucketManager, DataIngestion, DataLakeAgent, DataLoader, DataRetrieval,
+    SchemaCache, SchemaInference, SegmentIndex, SingleFlight, known_buckets, tracer,
+)
+
+# 1000 short lines, stored as bucket/text.txt by the `retrieval` fixture.
+LINES = b''.join(f'line {i}\n'.encode() for i in range(1000))
+
+FRAME = pd.DataFrame({
+    'id': range(100),
+    'city': ['Oslo', 'Lima'] * 50,
+    'day': [f'2024-01-{i % 28 + 1:02d}' for i in range(100)],
+    'score': [i / 4 for i in range(100)],
+})
+
+# The dtype read_csv gives text columns: object before pandas 3, str after.
+TEXT = str(pd.Series(['x']).dtype)
+
+
+def s3_error(code, bucket_name=None, object_name=None):
+    return S3Error(None, code, code, object_name, 'request-id', 'host-id',
+                   bucket_name, object_name)
+
+
+def user_headers(metadata):
+    headers = {}
+    for key, value in (metadata or {}).items():
+        if not key.lower().startswith('x-amz-meta-'):
+            key = f'x-amz-meta-{key}'
+        headers[key] = value
+    return headers
+
+
+class StoredObject:
+    def __init__(self, data, etag, headers, version_id, last_modified):
+        self.data = data
+        self.etag = etag
+        self.headers = headers
+        self.version_id = version_id
+        self.last_modified = last_modified
+
+
+class FakeResponse:
+    """Subset of urllib3's HTTPResponse that DataRetrieval reads from."""
+    def __init__(self, data, headers):
+        self._body = BytesIO(data)
+        self.headers = headers
+        self.closed = False
+        self.released = False
+
+    def read(self, amt=None):
+        return self._body.read(amt)
+
+    def stream(self, amt=64 * 1024):
+        yield from iter(lambda: self._body.read(amt), b'')
+
+    def close(self):
+        self.closed = True
+
+    def release_conn(self):
+        self.released = True
+
+
+class FakeMinio:
+    """Thread-safe in-memory MinIO client.
+
+    `versioned` gives every write a version id. `not_modified` picks how an
+    If-None-Match hit surfaces: 'server_error' (bodyless 304, minio-py 7.2)
+    or 'invalid_response' (304 with an XML content type, other 7.x releases).
+    `get_delay(object_name)` returns seconds to sleep before a GET answers.
+    """
+    def __init__(self, endpoint=None, versioned=False, not_modified='server_error'):
+        self._base_url = SimpleNamespace(host=endpoint or f'{uuid.uuid4().hex[:8]}.minio.test')
+        self.versioned = versioned
+        self.not_modified = not_modified
+        self.get_delay = None
+        self.fail_puts = None
+        self.buckets = {}
+        self.requests = collections.Counter()
+        self.uploads = {}
+        self.aborted = []
+        self.parts_in_flight = 0
+        self.max_parts_in_flight = 0
+        self._clock = itertools.count()
+        self._lock = threading.Lock()
+
+    # Helpers for tests.
+
+    def object_data(self, bucket_name, object_name):
+        return self.buckets[bucket_name][object_name].data
+
+    def object_headers(self, bucket_name, object_name):
+        return self.buckets[bucket_name][object_name].headers
+
+    def wipe_bucket(self, bucket_name):
+        """Delete a bucket and everything in it, behind the agent's back."""
+        with self._lock:
+            self.buckets.pop(bucket_name, None)
+
+    # Buckets.
+
+    def bucket_exists(self, bucket_name):
+        self.requests['bucket_exists'] += 1
+        return bucket_name in self.buckets
+
+    def make_bucket(self, bucket_name):
+        self.requests['make_bucket'] += 1
+        with self._lock:
+            if bucket_name in self.buckets:
+                raise s3_error('BucketAlreadyOwnedByYou', bucket_name)
+            self.buckets[bucket_name] = {}
+
+    def _bucket(self, bucket_name):
+        try:
+            return self.buckets[bucket_name]
+        except KeyError:
+            raise s3_error('NoSuchBucket', bucket_name) from None
+
+    def _object(self, bucket_name, object_name):
+        try:
+            return self._bucket(bucket_name)[object_name]
+        except KeyError:
+            raise s3_error('NoSuchKey', bucket_name, object_name) from None
+
+    # Writes.
+
+    def _store(self, bucket_name, object_name, data, etag, headers):
+        if self.fail_puts is not None:
+            raise self.fail_puts
+        version_id = uuid.uuid4().hex if self.versioned else None
+        last_modified = (datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+                         + datetime.timedelta(seconds=next(self._clock)))
+        with self._lock:
+            self._bucket(bucket_name)[object_name] = StoredObject(
+                bytes(data), etag, headers, version_id, last_modified
+            )
+        return SimpleNamespace(bucket_name=bucket_name, object_name=object_name,
+                               etag=etag, version_id=version_id)
+
+    def put_object(self, bucket_name, object_name, data, length, content_type=None,
+                   metadata=None, **kwargs):
+        self.requests['put_object'] += 1
+        self._bucket(bucket_name)
+        payload = data.read(length)
+        headers = HTTPHeaderDict(user_headers(metadata))
+        if content_type:
+            headers['Content-Type'] = content_type
+        return self._store(bucket_name, object_name, payload,
+                           hashlib.md5(payload).hexdigest(), headers)
+
+    def _create_multipart_upload(self, bucket_name, object_name, headers):
+        self.requests['create_multipart_upload'] += 1
+        self._bucket(bucket_name)
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {'headers': dict(headers), 'parts': {}}
+        return upload_id
+
+    def _upload_part(self, bucket_name, object_name, data, headers, upload_id, part_number):
+        self.requests['upload_part'] += 1
+        with self._lock:
+            self.parts_in_flight += 1
+            self.max_parts_in_flight = max(self.max_parts_in_flight, self.parts_in_flight)
+        try:
+            time.sleep(0.01)
+            if self.fail_puts is not None:
+                raise self.fail_puts
+            etag = hashlib.md5(data).hexdigest()
+            with self._lock:
+                self.uploads[upload_id]['parts'][part_number] = (bytes(data), etag)
+            return etag
+        finally:
+            with self._lock:
+                self.parts_in_flight -= 1
+
+    def _complete_multipart_upload(self, bucket_name, object_name, upload_id, parts):
+        self.requests['complete_multipart_upload'] += 1
+        with self._lock:
+            upload = self.uploads.pop(upload_id)
+        stored = [upload['parts'][part.part_number] for part in parts]
+        data = b''.join(data for data, _ in stored)
+        digest = hashlib.md5(b''.join(bytes.fromhex(etag) for _, etag in stored)).hexdigest()
+        headers = HTTPHeaderDict({key: value for key, value in upload['headers'].items()
+                                  if key.lower().startswith('x-amz-meta-')})
+        return self._store(bucket_name, object_name, data, f'{digest}-{len(stored)}', headers)
+
+    def _abort_multipart_upload(self, bucket_name, object_name, upload_id):
+        self.requests['abort_multipart_upload'] += 1
+        with self._lock:
+            self.uploads.pop(upload_id, None)
+            self.aborted.append(upload_id)
+
+    def remove_object(self, bucket_name, object_name):
+        self.requests['remove_object'] += 1
+        with self._lock:
+            self._bucket(bucket_name).pop(object_name, None)
+
+    def remove_objects(self, bucket_name, delete_object_list):
+        self.requests['remove_objects'] += 1
+        for delete_object in delete_object_list:
+            with self._lock:
+                self._bucket(bucket_name).pop(delete_object.name, None)
+        return iter(())
+
+    # Reads.
+
+    def _headers(self, stored):
+        headers = HTTPHeaderDict(stored.headers)
+        headers['ETag'] = f'"{stored.etag}"'
+        headers['Content-Length'] = str(len(stored.data))
+        if stored.version_id:
+            headers['x-amz-version-id'] = stored.version_id
+        return headers
+
+    def stat_object(self, bucket_name, object_name):
+        self.requests['stat_object'] += 1
+        stored = self._object(bucket_name, object_name)
+        return SimpleNamespace(
+            bucket_name=bucket_name, object_name=object_name, size=len(stored.data),
+            etag=stored.etag, version_id=stored.version_id,
+            last_modified=stored.last_modified, metadata=self._headers(stored),
+        )
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0, request_headers=None):
+        self.requests['get_object'] += 1
+        if self.get_delay is not None:
+            time.sleep(self.get_delay(object_name))
+        stored = self._object(bucket_name, object_name)
+        request_headers = request_headers or {}
+        if_match = request_headers.get('If-Match')
+        if if_match is not None and if_match.strip('"') != stored.etag:
+            raise s3_error('PreconditionFailed', bucket_name, object_name)
+        if_none_match = request_headers.get('If-None-Match')
+        if if_none_match is not None and if_none_match.strip('"') == stored.etag:
+            if self.not_modified == 'invalid_response':
+                raise InvalidResponseError(304, 'application/xml', None)
+            raise ServerError('server failed with HTTP status code 304', 304)
+        data = stored.data
+        byte_range = request_headers.get('Range')
+        if byte_range is not None:
+            data = data[-int(byte_range[len('bytes=-'):]):]
+        elif offset or length:
+            if offset >= len(data):
+                raise s3_error('InvalidRange', bucket_name, object_name)
+            data = data[offset:offset + length] if length else data[offset:]
+        return FakeResponse(data, self._headers(stored))
+
+    def list_objects(self, bucket_name, prefix=None, recursive=False, **kwargs):
+        self.requests['list_objects'] += 1
+        with self._lock:
+            objects = sorted(self._bucket(bucket_name).items())
+        for object_name, stored in objects:
+            if object_name.startswith(prefix or ''):
+                yield SimpleNamespace(
+                    bucket_name=bucket_name, object_name=object_name, size=len(stored.data),
+                    etag=stored.etag, last_modified=stored.last_modified, is_dir=False,
+                    version_id=None,
+                )
+
+
+class FakeMinioManager:
+    def __init__(self, client):
+        self.client = client
+
+    def get_client(self):
+        return self.client
+
+
+def put(minio, object_name, data, bucket_name='bucket'):
+    minio.put_object(bucket_name, object_name, BytesIO(data), len(data))
+
+
+def csv_bytes(frame=FRAME):
+    return frame.to_csv(index=False).encode()
+
+
+def ingestion(manager, **kwargs):
+    """A DataIngestion with its own bucket cache."""
+    bucket_manager = BucketManager(manager, bucket_cache=BucketCache())
+    return DataIngestion(manager, bucket_manager=bucket_manager, **kwargs)
+
+
+def retrieval_for(manager, **kwargs):
+    """A DataRetrieval with its own segment index and single-flight group."""
+    kwargs.setdefault('segment_index', SegmentIndex())
+    kwargs.setdefault('single_flight', SingleFlight())
+    return DataRetrieval(manager, **kwargs)
+
+
+@pytest.fixture
+def minio():
+    return FakeMinio()
+
+
+@pytest.fixture
+def manager(minio):
+    return FakeMinioManager(minio)
+
+
+@pytest.fixture
+def bucket(minio):
+    minio.make_bucket('bucket')
+    return 'bucket'
+
+
+@pytest.fixture
+def retrieval(manager, minio, bucket):
+    put(minio, 'text.txt', LINES)
+    return retrieval_for(manager)
+
+
+@pytest.fixture
+def loader(manager, bucket):
+    return DataLoader(retrieval_for(manager))
+
+
+@pytest.fixture
+def inference(loader):
+    return SchemaInference(loader, schema_cache=SchemaCache())
+
+
+@pytest.fixture
+def agent(manager):
+    return DataLakeAgent(manager, schema_cache=SchemaCache())
+
+
+@pytest.fixture(autouse=True)
+def isolated_state():
+    """Forget process-wide bucket knowledge and tracing between tests."""
+    known_buckets.invalidate()
+    yield
+    known_buckets.invalidate()
+    tracer.disable()
+    tracer.clear()
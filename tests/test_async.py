@@ -0,0 +1,28 @@
+import asyncio
+
+from DataLakeAgent import ObjectListing
+
+from conftest import LINES, ingestion
+
+
+def test_async_actions(agent, minio):
+    async def main():
+        await agent.arun('ingest', bucket_name='bucket', data=b'payload', object_name='key')
+        return await agent.arun('retrieve', bucket_name='bucket', object_name='key')
+
+    assert asyncio.run(main()) == b'payload'
+
+
+def test_async_ingest(manager, minio):
+    data_ingestion = ingestion(manager)
+    asyncio.run(data_ingestion.arun('bucket', b'async', 'key'))
+    assert minio.object_data('bucket', 'key') == b'async'
+
+
+def test_async_retrieve_and_list(manager, retrieval):
+    async def main():
+        data = await retrieval.arun('bucket', 'text.txt')
+        objects = await ObjectListing(manager).arun('bucket')
+        return data, [obj.object_name for obj in objects]
+
+    assert asyncio.run(main()) == (LINES, ['text.txt'])
@@ -0,0 +1,15 @@
+from DataLakeAgent import BatchIngestion
+
+from conftest import ingestion
+
+
+def test_batch_results_keep_input_order_and_errors(manager, minio):
+    data_ingestion = ingestion(manager)
+    batch = BatchIngestion(data_ingestion.bucket_manager, data_ingestion, max_workers=4)
+    items = [('bucket', f'key-{i}', f'value {i}'.encode()) for i in range(10)]
+    items.insert(3, ('bucket', 'broken', object()))
+    results = batch.run(iter(items))
+    assert [result['object_name'] for result in results] == [item[1] for item in items]
+    assert isinstance(results[3]['error'], Exception)
+    assert sum(result['error'] is None for result in results) == 10
+    assert minio.object_data('bucket', 'key-9') == b'value 9'
@@ -0,0 +1,18 @@
+from DataLakeAgent import BucketCache, BucketManager
+
+from conftest import ingestion
+
+
+def test_bucket_cache_skips_repeated_existence_checks(manager, minio):
+    bucket_manager = BucketManager(manager, bucket_cache=BucketCache())
+    for _ in range(3):
+        bucket_manager.run('bucket')
+    assert minio.requests['bucket_exists'] == 1
+
+
+def test_deleted_bucket_is_recreated_on_write(manager, minio):
+    data_ingestion = ingestion(manager)
+    data_ingestion.bucket_manager.run('bucket')
+    minio.wipe_bucket('bucket')
+    data_ingestion.put('bucket', 'key', b'data')
+    assert minio.object_data('bucket', 'key') == b'data'
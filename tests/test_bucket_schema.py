@@ -0,0 +1,69 @@
+import http.server
+import threading
+import urllib.parse
+
+from DataLakeAgent import BucketSchemaInference, MinioManager, ObjectListing
+
+from conftest import TEXT, put
+
+
+def test_bucket_schema_reports_drift(manager, minio, inference):
+    put(minio, 'p/1.csv', b'a,b\n1,x\n')
+    put(minio, 'p/2.csv', b'a,b\n2.5,y\n')
+    put(minio, 'p/3.csv', b'a,c\n3,z\n')
+    put(minio, 'p/broken.csv', b'')
+    bucket_inference = BucketSchemaInference(manager, ObjectListing(manager), inference)
+    report = bucket_inference.run('bucket', prefix='p/', processes=False)
+    assert report['schema'] == {'a': 'float64', 'b': TEXT, 'c': TEXT}
+    assert report['rows'] == 3
+    assert list(report['errors']) == ['p/broken.csv']
+    assert [event['object_name'] for event in report['drift']] == ['p/2.csv', 'p/3.csv']
+    assert report['drift'][1]['added'] == ['c'] and report['drift'][1]['dropped'] == ['b']
+    gets = minio.requests['get_object']
+    bucket_inference.run('bucket', prefix='p/', processes=False)
+    assert minio.requests['get_object'] - gets == 1  # only the broken object is retried
+
+
+class ObjectServer(http.server.ThreadingHTTPServer):
+    """Serves a FakeMinio's objects over the S3 GET API, for worker processes."""
+    def __init__(self, minio):
+        super().__init__(('127.0.0.1', 0), ObjectHandler)
+        self.minio = minio
+
+
+class ObjectHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        bucket_name, _, object_name = url.path.lstrip('/').partition('/')
+        if 'location' in urllib.parse.parse_qs(url.query, keep_blank_values=True):
+            body, headers = b'<LocationConstraint/>', {'Content-Type': 'application/xml'}
+        else:
+            object_name = urllib.parse.unquote(object_name)
+            body = self.server.minio.object_data(bucket_name, object_name)
+            etag = self.server.minio.stat_object(bucket_name, object_name).etag
+            headers = {'Content-Type': 'text/csv', 'ETag': f'"{etag}"'}
+        self.send_response(200)
+        for name, value in dict(headers, **{'Content-Length': str(len(body))}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_bucket_schema_in_worker_processes(manager, minio, inference):
+    put(minio, 'p/1.csv', b'a,b\n1,x\n')
+    put(minio, 'p/2.csv', b'a,c\n2.5,z\n')
+    server = ObjectServer(minio)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        workers = MinioManager(endpoint=f'127.0.0.1:{server.server_port}')
+        bucket_inference = BucketSchemaInference(workers, ObjectListing(manager), inference)
+        report = bucket_inference.run('bucket', prefix='p/', max_workers=2, processes=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert report['errors'] == {}
+    assert report['schema'] == {'a': 'float64', 'b': TEXT, 'c': TEXT}
+    assert report['rows'] == 2
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from DataLakeAgent import IncrementalSchema, widen_dtype
+
+from conftest import FRAME, TEXT, csv_bytes, put
+
+
+def test_load_csv_whole_and_in_chunks(loader, minio):
+    put(minio, 'data.csv', csv_bytes())
+    pd.testing.assert_frame_equal(loader.run('bucket', 'data.csv'), FRAME)
+    chunks = list(loader.run('bucket', 'data.csv', chunksize=30))
+    assert [len(chunk) for chunk in chunks] == [30, 30, 30, 10]
+
+
+def test_widen_dtype():
+    assert widen_dtype('int64', 'float64') == 'float64'
+    assert widen_dtype('int64', 'object') == 'object'
+    assert widen_dtype(None, 'bool') == 'bool'
+
+
+def test_incremental_schema_ignores_all_null_chunks():
+    schema = IncrementalSchema()
+    schema.update(pd.DataFrame({'a': [1, 2]}))
+    schema.update(pd.DataFrame({'a': [None, None]}, dtype=object))
+    schema.update(pd.DataFrame({'a': [1.5], 'b': ['x']}))
+    assert schema.to_dict() == {'a': 'float64', 'b': TEXT}
+    assert schema.columns['a']['nulls'] == 2
+    assert schema.columns['b']['nulls'] == 4
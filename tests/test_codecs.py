@@ -0,0 +1,15 @@
+import gzip
+
+from DataLakeAgent import CODEC_HEADER, DataRetrieval, SegmentIndex
+
+from conftest import ingestion
+
+
+def test_gzip_codec_round_trip(manager, minio):
+    data_ingestion = ingestion(manager, codec='gzip')
+    data_ingestion.put('bucket', 'key', b'compressible ' * 1000)
+    assert minio.object_headers('bucket', 'key')[CODEC_HEADER] == 'gzip'
+    assert gzip.decompress(minio.object_data('bucket', 'key')) == b'compressible ' * 1000
+    retrieval = DataRetrieval(manager, segment_index=SegmentIndex())
+    assert retrieval.read('bucket', 'key') == b'compressible ' * 1000
+    assert retrieval.read_range('bucket', 'key', 13, 12) == b'compressible'
@@ -0,0 +1,74 @@
+from DataLakeAgent import BLOB_POINTER_HEADER, DataRetrieval, DigestIndex, SegmentIndex, blob_name
+
+from conftest import FakeMinio, FakeMinioManager, ingestion
+
+
+def test_dedup_stores_one_blob_behind_pointers(manager, minio):
+    data_ingestion = ingestion(manager, dedup=True, digest_index=DigestIndex())
+    data_ingestion.put('bucket', 'a', b'same bytes')
+    data_ingestion.put('bucket', 'b', b'same bytes')
+    blobs = [name for name in minio.buckets['bucket'] if name.startswith('.cas/')]
+    assert len(blobs) == 1
+    assert minio.object_headers('bucket', 'b')[BLOB_POINTER_HEADER] == blobs[0]
+    retrieval = DataRetrieval(manager, segment_index=SegmentIndex())
+    assert retrieval.read('bucket', 'a') == retrieval.read('bucket', 'b') == b'same bytes'
+
+
+def test_dedup_reuploads_a_blob_wiped_with_its_bucket(manager, minio):
+    data_ingestion = ingestion(manager, dedup=True, digest_index=DigestIndex())
+    data_ingestion.put('bucket', 'a', b'same bytes')
+    minio.wipe_bucket('bucket')
+    data_ingestion.put('bucket', 'b', b'same bytes')
+    retrieval = DataRetrieval(manager, segment_index=SegmentIndex())
+    assert retrieval.read('bucket', 'b') == b'same bytes'
+
+
+def test_dedup_reuploads_a_blob_deleted_behind_the_index(manager, minio):
+    data_ingestion = ingestion(manager, dedup=True, digest_index=DigestIndex())
+    data_ingestion.put('bucket', 'a', b'same bytes')
+    for name in list(minio.buckets['bucket']):
+        minio.remove_object('bucket', name)
+    data_ingestion.put('bucket', 'b', b'same bytes')
+    retrieval = DataRetrieval(manager, segment_index=SegmentIndex())
+    assert retrieval.read('bucket', 'b') == b'same bytes'
+
+
+def test_dedup_rewrites_the_blob_when_the_pointer_recreates_the_bucket(manager, minio):
+    data_ingestion = ingestion(manager, dedup=True, digest_index=DigestIndex())
+    data_ingestion.put('bucket', 'a', b'same bytes')
+    real_stat = minio.stat_object
+
+    def wipe_after_check(*args, **kwargs):
+        stat = real_stat(*args, **kwargs)
+        minio.wipe_bucket('bucket')
+        return stat
+
+    minio.stat_object = wipe_after_check
+    data_ingestion.put('bucket', 'b', b'same bytes')
+    minio.stat_object = real_stat
+    retrieval = DataRetrieval(manager, segment_index=SegmentIndex())
+    assert retrieval.read('bucket', 'b') == b'same bytes'
+
+
+def test_digest_index_separates_endpoints(minio):
+    other = FakeMinio()
+    digest_index = DigestIndex()
+    for client in (minio, other):
+        data_ingestion = ingestion(FakeMinioManager(client), dedup=True, digest_index=digest_index)
+        data_ingestion.put('bucket', 'a', b'same bytes')
+    for client in (minio, other):
+        assert any(name.startswith('.cas/') for name in client.buckets['bucket'])
+
+
+def test_digest_index_persists(tmp_path):
+    path = str(tmp_path / 'digests.sqlite')
+    DigestIndex(path).add('minio.test', 'bucket', 'abc')
+    DigestIndex(path).add('minio.test', 'other', 'abc')
+    assert ('minio.test', 'bucket', 'abc') in DigestIndex(path)
+    DigestIndex(path).discard('minio.test', 'bucket')
+    assert ('minio.test', 'bucket', 'abc') not in DigestIndex(path)
+    assert ('minio.test', 'other', 'abc') in DigestIndex(path)
+
+
+def test_blob_name_shards_by_prefix():
+    assert blob_name('abcdef') == '.cas/sha256/ab/abcdef'
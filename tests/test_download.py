@@ -0,0 +1,24 @@
+import pytest
+from minio.error import S3Error
+
+from conftest import LINES, put
+
+
+def test_download_reassembles_ranged_parts(retrieval, minio, tmp_path):
+    assert retrieval.download('bucket', 'text.txt', part_size=1000, max_workers=3) == LINES
+    dest = tmp_path / 'copy.txt'
+    assert retrieval.download('bucket', 'text.txt', str(dest), part_size=1000) == len(LINES)
+    assert dest.read_bytes() == LINES
+
+
+def test_download_fails_when_the_object_changes_mid_way(retrieval, minio):
+    real_get = minio.get_object
+
+    def overwrite_then_get(*args, **kwargs):
+        if kwargs.get('offset'):
+            put(minio, 'text.txt', b'x' * len(LINES))
+        return real_get(*args, **kwargs)
+
+    minio.get_object = overwrite_then_get
+    with pytest.raises(S3Error, match='PreconditionFailed'):
+        retrieval.download('bucket', 'text.txt', part_size=1000, max_workers=1)
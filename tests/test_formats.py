@@ -0,0 +1,57 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+
+from DataLakeAgent import apply_filters, detect_format
+
+from conftest import FRAME, csv_bytes, put
+
+
+def test_detect_format_from_name_and_magic():
+    assert detect_format('a/b.csv.gz') == ('csv', 'gzip')
+    assert detect_format('events', b'{"a": 1}') == ('jsonl', None)
+    assert detect_format('table', b'PAR1\x15\x04') == ('parquet', None)
+
+
+def test_projection_and_filters_over_compressed_csv(loader, minio):
+    put(minio, 'data.csv.gz', gzip.compress(csv_bytes()))
+    df = loader.run('bucket', 'data.csv.gz', columns=['id'], filters=[('city', '==', 'Lima')])
+    assert list(df.columns) == ['id']
+    assert df['id'].tolist() == list(range(1, 100, 2))
+
+
+@pytest.mark.parametrize('name', ['data.tsv', 'data.tsv.gz'])
+def test_tsv_is_split_on_tabs(loader, minio, name):
+    data = FRAME.to_csv(index=False, sep='\t').encode()
+    put(minio, name, gzip.compress(data) if name.endswith('.gz') else data)
+    assert loader.run('bucket', name).equals(FRAME)
+    assert pd.concat(loader.run('bucket', name, chunksize=30)).reset_index(drop=True).equals(FRAME)
+
+
+@pytest.mark.parametrize('optimize', [False, True])
+def test_explicit_format_keeps_compression_from_name(loader, minio, optimize):
+    put(minio, 'data.csv.gz', gzip.compress(csv_bytes()))
+    df = loader.run('bucket', 'data.csv.gz', format='csv', optimize=optimize)
+    assert df['id'].tolist() == FRAME['id'].tolist()
+
+
+def test_jsonl_without_extension_is_sniffed(loader, minio):
+    put(minio, 'events', FRAME.to_json(orient='records', lines=True).encode())
+    assert len(loader.run('bucket', 'events', filters=[('score', '>=', 24.0)])) == 4
+
+
+def test_parquet_skips_row_groups_by_statistics(loader, minio):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    buffer = io.BytesIO()
+    pyarrow.parquet.write_table(pyarrow.Table.from_pandas(FRAME), buffer, row_group_size=10)
+    put(minio, 'data.parquet', buffer.getvalue())
+    df = loader.run('bucket', 'data.parquet', columns=['score'], filters=[('id', '<', 5)])
+    assert df['score'].tolist() == [0.0, 0.25, 0.5, 0.75, 1.0]
+
+
+def test_apply_filters():
+    df = apply_filters(FRAME, [('city', 'in', ['Oslo']), ('id', '<', 4)])
+    assert df['id'].tolist() == [0, 2]
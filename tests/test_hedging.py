@@ -0,0 +1,17 @@
+import time
+
+from DataLakeAgent import HedgePolicy
+
+from conftest import LINES
+
+
+def test_hedged_get_beats_a_slow_node(retrieval, minio):
+    retrieval.hedge_policy = HedgePolicy(min_samples=5, min_delay=0.01)
+    for _ in range(5):
+        retrieval.read('bucket', 'text.txt')
+    slow = iter([0.5])
+    minio.get_delay = lambda _: next(slow, 0)
+    start = time.monotonic()
+    assert retrieval.read('bucket', 'text.txt') == LINES
+    assert time.monotonic() - start < 0.4
+    assert retrieval.hedge_policy.stats['hedge_wins'] == 1
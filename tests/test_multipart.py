@@ -0,0 +1,41 @@
+import io
+import os
+
+import pytest
+
+from DataLakeAgent import MIN_PART_SIZE, iter_parts
+
+from conftest import ingestion, s3_error
+
+BIG = os.urandom(MIN_PART_SIZE) * 2 + b'tail'
+
+
+def test_iter_parts_rechunks_every_source():
+    for source in (b'abcdefg', iter([b'ab', b'cdefg']), io.BytesIO(b'abcdefg')):
+        assert list(iter_parts(source, 3)) == [b'abc', b'def', b'g']
+
+
+def test_small_payload_is_a_single_put(manager, minio):
+    data_ingestion = ingestion(manager)
+    data_ingestion.put('bucket', 'small.txt', b'hello')
+    assert minio.object_data('bucket', 'small.txt') == b'hello'
+    assert minio.requests['create_multipart_upload'] == 0
+
+
+def test_large_stream_uploads_bounded_parallel_parts(manager, minio):
+    data_ingestion = ingestion(manager, part_size=MIN_PART_SIZE, max_in_flight_parts=2)
+    chunks = (BIG[i:i + 1024 * 1024] for i in range(0, len(BIG), 1024 * 1024))
+    data_ingestion.put('bucket', 'big.bin', chunks)
+    assert minio.object_data('bucket', 'big.bin') == BIG
+    assert minio.requests['upload_part'] == 3
+    assert minio.max_parts_in_flight <= 2
+
+
+def test_failed_multipart_upload_is_aborted(manager, minio):
+    data_ingestion = ingestion(manager, part_size=MIN_PART_SIZE)
+    data_ingestion.bucket_manager.run('bucket')
+    minio.fail_puts = s3_error('InternalError')
+    with pytest.raises(Exception):
+        data_ingestion.put('bucket', 'big.bin', BIG)
+    assert len(minio.aborted) == 1
+    assert 'big.bin' not in minio.buckets['bucket']
@@ -0,0 +1,52 @@
+import pandas as pd
+
+from conftest import FRAME, csv_bytes, put
+
+
+def test_optimized_load_shrinks_dtypes(loader, minio):
+    put(minio, 'data.csv', csv_bytes())
+    df = loader.run('bucket', 'data.csv', optimize=True)
+    assert str(df['city'].dtype) == 'category'
+    assert str(df['day'].dtype).startswith('datetime64')
+    assert str(df['id'].dtype) == 'uint8'
+    assert str(df['score'].dtype) == 'float32'
+    report = df.attrs['memory_report']
+    assert report['after_bytes'] < report['before_bytes']
+
+
+def test_optimized_load_ignores_object_hints(loader, minio):
+    put(minio, 'data.csv', csv_bytes())
+    df = loader.run('bucket', 'data.csv', optimize=True,
+                    dtypes={'city': 'object', 'day': 'object', 'id': 'int64'})
+    assert str(df['city'].dtype) == 'category'
+    assert str(df['day'].dtype).startswith('datetime64')
+    df = loader.run('bucket', 'data.csv', optimize=True, dtypes={'city': 'datetime64[ns]'})
+    assert df['city'].isna().all()
+
+
+def test_optimized_load_coerces_bad_dates_in_later_chunks(loader, minio):
+    frame = FRAME.copy()
+    frame.loc[95, 'day'] = 'next tuesday'
+    put(minio, 'data.csv', csv_bytes(frame))
+    df = loader.optimized('bucket', 'data.csv', chunksize=30)
+    assert str(df['day'].dtype).startswith('datetime64')
+    assert df['day'].isna().tolist() == [i == 95 for i in range(100)]
+    assert df.attrs['memory_report']['coerced_to_null'] == {'day': 1}
+
+
+def test_optimized_load_concatenates_chunks_as_categoricals(loader, minio, monkeypatch):
+    frame = FRAME.copy()
+    frame['city'] = ['Oslo'] * 40 + ['Lima'] * 60
+    put(minio, 'data.csv', csv_bytes(frame))
+    concatenated = []
+    concat = pd.concat
+
+    def record(frames, **kwargs):
+        result = concat(frames, **kwargs)
+        concatenated.append(str(result['city'].dtype))
+        return result
+
+    monkeypatch.setattr(pd, 'concat', record)
+    df = loader.optimized('bucket', 'data.csv', chunksize=30)
+    assert concatenated == ['category']
+    assert df['city'].tolist() == frame['city'].tolist()
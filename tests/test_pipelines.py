@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from DataLakeAgent import ACTIONS, DataLakeAgent, SchemaCache, register_action
+
+
+def test_ingest_retrieve_and_list(agent, minio):
+    agent.run('ingest', bucket_name='bucket', data=b'payload', object_name='key')
+    assert agent.run('retrieve', bucket_name='bucket', object_name='key') == b'payload'
+    assert [obj.object_name for obj in agent.run('list', bucket_name='bucket')] == ['key']
+
+
+def test_unknown_action_and_arguments(agent):
+    with pytest.raises(ValueError):
+        agent.run('nonexistent')
+    with pytest.raises(TypeError, match='unexpected arguments'):
+        agent.run('retrieve', bucket_name='bucket', object_name='key', colour='red')
+
+
+def test_registered_actions_reach_new_agents(manager):
+    register_action('shout', lambda agent: [lambda text: text.upper()])
+    try:
+        assert DataLakeAgent(manager, schema_cache=SchemaCache()).run('shout', text='hi') == 'HI'
+    finally:
+        del ACTIONS['shout']
+
+
+def test_async_actions_use_the_registry(agent, minio):
+    async def shout(text):
+        return text.upper()
+
+    agent.register('echo', [(shout, 'text'), lambda text: text + '!'])
+
+    async def main():
+        await agent.arun('ingest', bucket_name='bucket', data=b'payload', object_name='key')
+        listed = await agent.arun('list', bucket_name='bucket')
+        with pytest.raises(ValueError):
+            await agent.arun('nonexistent')
+        with pytest.raises(TypeError, match='unexpected arguments'):
+            await agent.arun('retrieve', bucket_name='bucket', object_name='key', colour='red')
+        return [obj.object_name for obj in listed], await agent.arun('echo', text='hi')
+
+    assert asyncio.run(main()) == (['key'], 'HI!')
+
+
+def test_generate_schema_rejects_chunksize(agent, minio):
+    agent.run('ingest', bucket_name='bucket', data=b'a\n1\n', object_name='data.csv')
+    with pytest.raises(TypeError, match='chunksize'):
+        agent.run('generate_schema', bucket_name='bucket', object_name='data.csv',
+                  file_path='unused.txt', chunksize=10)
+
+
+def test_pipeline_stages_pass_named_outputs(agent):
+    agent.register('double', [(lambda value: value * 2, 'value'), lambda value: value + 1])
+    assert agent.run('double', value=20) == 41
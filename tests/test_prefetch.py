@@ -0,0 +1,26 @@
+from DataLakeAgent import (
+    DataLoader, DataRetrieval, DigestIndex, Prefetcher, SegmentIndex, SegmentPacker,
+)
+
+from conftest import ingestion, put
+
+
+def test_prefetcher_yields_in_listing_order(retrieval, minio):
+    for i in range(5):
+        put(minio, f'p/{i}', str(i).encode())
+    prefetched = list(Prefetcher(retrieval, depth=2).run('bucket', prefix='p/'))
+    assert prefetched == [(f'p/{i}', str(i).encode()) for i in range(5)]
+
+
+def test_prefetcher_prefix_covers_packed_keys_and_skips_bookkeeping(manager, minio):
+    segments = SegmentIndex()
+    data_ingestion = ingestion(manager, digest_index=DigestIndex(), segment_index=segments)
+    packer = SegmentPacker(data_ingestion, segment_index=segments)
+    packer.run('bucket', b'packed', 'b')
+    packer.flush()
+    data_ingestion.put('bucket', 'a', b'plain', dedup=True)
+    data_ingestion.put('bucket', 'c', b'0')
+    retrieval = DataRetrieval(manager, segment_index=segments)
+    DataLoader(retrieval).run('bucket', 'c', stats=True)
+    prefetched = list(Prefetcher(retrieval).run('bucket', prefix=''))
+    assert prefetched == [('a', b'plain'), ('b', b'packed'), ('c', b'0')]
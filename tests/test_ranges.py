@@ -0,0 +1,11 @@
+from conftest import LINES
+
+
+def test_ranges(retrieval, minio):
+    assert retrieval.read_range('bucket', 'text.txt', 5, 1) == b'0'
+    assert retrieval.head('bucket', 'text.txt', 6) == b'line 0'
+    assert retrieval.tail('bucket', 'text.txt', 9) == b'line 999\n'
+    assert retrieval.read_range('bucket', 'text.txt', len(LINES) + 10, 5) == b''
+    assert retrieval.head_lines('bucket', 'text.txt', 3, chunk_size=4) == [
+        'line 0', 'line 1', 'line 2',
+    ]
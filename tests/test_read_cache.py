@@ -0,0 +1,86 @@
+import pytest
+from minio.error import S3Error
+
+from DataLakeAgent import (
+    DataLakeAgent, DataRetrieval, ReadCache, SchemaCache, SegmentIndex, SingleFlight,
+)
+
+from conftest import LINES, FakeMinio, FakeMinioManager, put
+
+
+def test_read_cache_serves_fresh_entries_without_a_get(manager, minio, retrieval):
+    retrieval.read_cache = ReadCache(fresh_for=60)
+    retrieval.read('bucket', 'text.txt')
+    gets = minio.requests['get_object']
+    assert retrieval.read('bucket', 'text.txt') == LINES
+    assert minio.requests['get_object'] == gets
+    assert retrieval.read_cache.stats['memory_hits'] == 1
+
+
+def test_read_cache_revalidates_stale_entries(retrieval, minio):
+    retrieval.read_cache = ReadCache(fresh_for=0)
+    retrieval.read('bucket', 'text.txt')
+    assert retrieval.read('bucket', 'text.txt') == LINES
+    assert retrieval.read_cache.stats['revalidations'] == 1
+    put(minio, 'text.txt', b'changed')
+    assert retrieval.read('bucket', 'text.txt') == b'changed'
+    assert retrieval.read_cache.stats['refreshes'] == 1
+
+
+def test_read_cache_revalidates_on_an_xml_304():
+    minio = FakeMinio(not_modified='invalid_response')
+    minio.make_bucket('bucket')
+    put(minio, 'text.txt', LINES)
+    retrieval = DataRetrieval(FakeMinioManager(minio), segment_index=SegmentIndex(),
+                              read_cache=ReadCache(fresh_for=0), single_flight=SingleFlight())
+    retrieval.read('bucket', 'text.txt')
+    assert retrieval.read('bucket', 'text.txt') == LINES
+    assert retrieval.read_cache.stats['revalidations'] == 1
+
+
+def test_read_cache_survives_restart_on_disk(retrieval, tmp_path):
+    retrieval.read_cache = ReadCache(cache_dir=str(tmp_path), fresh_for=60)
+    retrieval.read('bucket', 'text.txt')
+    reloaded = ReadCache(cache_dir=str(tmp_path), fresh_for=60)
+    data, etag, fresh = reloaded.get(retrieval.endpoint, 'bucket', 'text.txt')
+    assert data == LINES and not fresh
+
+
+def test_writes_invalidate_the_read_cache(manager, minio):
+    agent = DataLakeAgent(manager, read_cache=ReadCache(fresh_for=60), schema_cache=SchemaCache())
+    for data in (b'v1', b'v2'):
+        agent.run('ingest', bucket_name='bucket', data=data, object_name='key')
+        assert agent.run('retrieve', bucket_name='bucket', object_name='key') == data
+    agent.run('ingest_packed', bucket_name='bucket', data=b'v3', object_name='key')
+    agent.run('flush')
+    assert agent.run('retrieve', bucket_name='bucket', object_name='key') == b'v3'
+
+
+def test_sync_reads_back_its_own_manifest(manager, minio, tmp_path):
+    agent = DataLakeAgent(manager, read_cache=ReadCache(fresh_for=60), schema_cache=SchemaCache())
+    (tmp_path / 'a.txt').write_bytes(b'a')
+    (tmp_path / 'b.txt').write_bytes(b'b')
+    agent.run('sync', local_dir=str(tmp_path), bucket_name='bucket')
+    assert agent.run('retrieve', bucket_name='bucket', object_name='a.txt') == b'a'
+    (tmp_path / 'a.txt').unlink()
+    assert agent.run('sync', local_dir=str(tmp_path), bucket_name='bucket', delete=True)[
+        'deleted'] == 1
+    assert agent.run('sync', local_dir=str(tmp_path), bucket_name='bucket') == {
+        'uploaded': 0, 'unchanged': 1, 'deleted': 0, 'failed': [],
+    }
+    with pytest.raises(S3Error, match='NoSuchKey'):
+        agent.run('retrieve', bucket_name='bucket', object_name='a.txt')
+
+
+def test_read_cache_keeps_endpoints_apart():
+    read_cache = ReadCache(fresh_for=60)
+    retrievals = []
+    for data in (b'first server', b'second server'):
+        minio = FakeMinio()
+        minio.make_bucket('bucket')
+        put(minio, 'key', data)
+        retrievals.append(DataRetrieval(FakeMinioManager(minio), segment_index=SegmentIndex(),
+                                        read_cache=read_cache, single_flight=SingleFlight()))
+    assert [retrieval.read('bucket', 'key') for retrieval in retrievals] == [
+        b'first server', b'second server',
+    ]
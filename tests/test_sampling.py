@@ -0,0 +1,50 @@
+import io
+
+import numpy as np
+import pytest
+
+from conftest import put
+
+
+def test_stratified_sample_flags_rare_outliers(inference, minio):
+    rows = [str(i) for i in range(20000)]
+    rows[12345] = 'oops'
+    put(minio, 'big.csv', ('n\n' + '\n'.join(rows) + '\n').encode())
+    schema = inference.sample('bucket', 'big.csv', rows=2000, strata=8, escalate=False)
+    assert schema.method == 'stratified'
+    assert schema.columns['n']['dominant'] == 'int64'
+    assert minio.requests['get_object'] <= 10
+
+
+def test_reservoir_sample_and_escalation(inference, minio):
+    put(minio, 'rows.jsonl', b'{"a": 1}\n{"a": null}\n{"a": 3}\n')
+    schema = inference.sample('bucket', 'rows.jsonl', rows=10, seed=1)
+    # Two values cannot bound the share, so the whole object was scanned.
+    assert schema.method == 'full'
+    assert schema.to_dict() == {'a': 'float64'}
+
+
+def test_arrow_footer_schema_counts_rows_without_reading_batches(inference, minio,
+                                                                  monkeypatch):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.ipc
+    table = pyarrow.table({'x': np.arange(200_000), 'y': np.arange(200_000) * 0.5})
+    buffer = io.BytesIO()
+    with pyarrow.ipc.new_file(buffer, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=20_000):
+            writer.write_batch(batch)
+    put(minio, 'data.arrow', buffer.getvalue())
+    retrieval = inference.data_loader.data_retrieval
+    fetched = []
+    read_range = retrieval.read_range
+
+    def counted(*args, **kwargs):
+        data = read_range(*args, **kwargs)
+        fetched.append(len(data))
+        return data
+
+    monkeypatch.setattr(retrieval, 'read_range', counted)
+    schema = inference.sample('bucket', 'data.arrow')
+    assert schema.method == 'footer'
+    assert schema.rows == 200_000
+    assert sum(fetched) < len(buffer.getvalue()) // 100
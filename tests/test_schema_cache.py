@@ -0,0 +1,45 @@
+from DataLakeAgent import (
+    BucketSchemaInference, DataLoader, DataRetrieval, ObjectListing, SchemaCache, SchemaInference,
+    SegmentIndex, SingleFlight,
+)
+
+from conftest import TEXT, FakeMinio, FakeMinioManager, put
+
+
+def test_generate_schema_writes_definition(agent, minio, tmp_path):
+    agent.run('ingest', bucket_name='bucket', data=b'a,b\n1,2.5\n', object_name='data.csv')
+    path = tmp_path / 'schema.txt'
+    agent.run('generate_schema', bucket_name='bucket', object_name='data.csv',
+              file_path=str(path))
+    assert path.read_text() == 'a: int64\nb: float64\n'
+
+
+def test_schema_cache_skips_unchanged_objects(inference, minio):
+    put(minio, 'data.csv', b'a,b\n1,x\n')
+    assert inference.infer('bucket', 'data.csv').to_dict() == {'a': 'int64', 'b': TEXT}
+    gets = minio.requests['get_object']
+    inference.infer('bucket', 'data.csv')
+    assert minio.requests['get_object'] == gets
+    put(minio, 'data.csv', b'a,b\n1.5,x\n')
+    assert inference.infer('bucket', 'data.csv').to_dict()['a'] == 'float64'
+
+
+def test_versioned_objects_share_cache_entries_with_listings():
+    versioned = FakeMinio(versioned=True)
+    versioned.make_bucket('bucket')
+    put(versioned, 'p/1.csv', b'a\n1\n')
+    manager = FakeMinioManager(versioned)
+    retrieval = DataRetrieval(manager, segment_index=SegmentIndex(), single_flight=SingleFlight())
+    inference = SchemaInference(DataLoader(retrieval), schema_cache=SchemaCache())
+    inference.infer('bucket', 'p/1.csv')
+    gets = versioned.requests['get_object']
+    report = BucketSchemaInference(manager, ObjectListing(manager), inference).run(
+        'bucket', prefix='p/', processes=False,
+    )
+    assert report['schema'] == {'a': 'int64'}
+    assert versioned.requests['get_object'] == gets
+
+
+def test_infer_sniffs_objects_without_an_extension(inference, minio):
+    put(minio, 'events', b'{"a": 1, "b": "x"}\n{"a": 2, "b": "y"}\n')
+    assert inference.infer('bucket', 'events').to_dict() == {'a': 'int64', 'b': TEXT}
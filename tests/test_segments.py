@@ -0,0 +1,91 @@
+import json
+import time
+
+import pytest
+from minio.error import S3Error
+
+from DataLakeAgent import DataRetrieval, DigestIndex, SegmentIndex, SegmentPacker
+
+from conftest import ingestion, s3_error
+
+
+def test_packed_objects_read_through_their_segment(manager, minio):
+    segments = SegmentIndex()
+    packer = SegmentPacker(ingestion(manager), segment_index=segments)
+    packer.run('bucket', b'first', 'a.txt')
+    packer.run('bucket', b'second', 'b.txt')
+    packer.flush()
+    names = sorted(minio.buckets['bucket'])
+    assert len(names) == 2 and names[0].endswith('.idx') and names[1].endswith('.seg')
+    assert json.loads(minio.object_data('bucket', names[0])) == {'a.txt': [0, 5], 'b.txt': [5, 6]}
+    retrieval = DataRetrieval(manager, segment_index=segments)
+    assert retrieval.read('bucket', 'b.txt') == b'second'
+    assert retrieval.tail('bucket', 'b.txt', 3) == b'ond'
+
+
+@pytest.mark.parametrize('options', [{'codec': 'gzip'}, {'dedup': True}])
+def test_segments_ignore_ingestion_codec_and_dedup(manager, minio, options):
+    segments = SegmentIndex()
+    packer = SegmentPacker(ingestion(manager, digest_index=DigestIndex(), **options),
+                           segment_index=segments)
+    packer.run('bucket', b'first', 'a.txt')
+    packer.run('bucket', b'second', 'b.txt')
+    packer.flush()
+    retrieval = DataRetrieval(manager, segment_index=segments)
+    assert retrieval.read('bucket', 'a.txt') == b'first'
+    assert retrieval.read('bucket', 'b.txt') == b'second'
+
+
+def test_packed_keys_resolve_in_other_processes(manager, minio):
+    packer = SegmentPacker(ingestion(manager), segment_index=SegmentIndex())
+    packer.run('bucket', b'old', 'a.txt')
+    packer.flush()
+    packer.run('bucket', b'new', 'a.txt')
+    packer.run('bucket', b'second', 'b.txt')
+    packer.flush()
+    retrieval = DataRetrieval(manager, segment_index=SegmentIndex())
+    assert retrieval.read('bucket', 'a.txt') == b'new'
+    assert retrieval.stat('bucket', 'b.txt') == (6, None)
+    assert retrieval.download('bucket', 'b.txt') == b'second'
+    with pytest.raises(S3Error, match='NoSuchKey'):
+        retrieval.read('bucket', 'missing.txt')
+
+
+def test_packer_writes_aged_segments_and_keeps_failed_ones(manager, minio):
+    segments = SegmentIndex()
+    packer = SegmentPacker(ingestion(manager), segment_index=segments, max_age=0.05)
+    minio.make_bucket('bucket')
+    minio.fail_puts = s3_error('ServiceUnavailable')
+    packer.run('bucket', b'first', 'a.txt')
+    with pytest.raises(S3Error):
+        packer.flush()
+    packer.run('bucket', b'second', 'b.txt')
+    minio.fail_puts = None
+    deadline = time.monotonic() + 5
+    while segments.get('bucket', 'b.txt') is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    retrieval = DataRetrieval(manager, segment_index=segments)
+    assert retrieval.read('bucket', 'a.txt') == b'first'
+    assert retrieval.read('bucket', 'b.txt') == b'second'
+
+
+def test_plain_put_supersedes_packed_copy(manager, minio):
+    segments = SegmentIndex()
+    data_ingestion = ingestion(manager, segment_index=segments)
+    packer = SegmentPacker(data_ingestion, segment_index=segments)
+    packer.run('bucket', b'old', 'a.txt')
+    packer.flush()
+    data_ingestion.put('bucket', 'a.txt', b'new')
+    retrieval = DataRetrieval(manager, segment_index=segments)
+    assert retrieval.read('bucket', 'a.txt') == b'new'
+    segments.load(minio, 'bucket')
+    assert segments.get('bucket', 'a.txt') is None
+
+
+def test_misses_list_segments_at_most_once_per_interval(manager, minio):
+    minio.make_bucket('bucket')
+    retrieval = DataRetrieval(manager, segment_index=SegmentIndex())
+    for _ in range(3):
+        with pytest.raises(S3Error, match='NoSuchKey'):
+            retrieval.read('bucket', 'missing.txt')
+    assert minio.requests['list_objects'] == 1
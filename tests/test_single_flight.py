@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+import pytest
+
+from DataLakeAgent import DataRetrieval, SegmentIndex, SingleFlight
+
+from conftest import LINES, FakeMinio, FakeMinioManager, put
+
+
+def test_concurrent_reads_share_one_get(retrieval, minio):
+    minio.get_delay = lambda _: 0.1
+    barrier = threading.Barrier(8)
+    results = []
+
+    def read():
+        barrier.wait()
+        results.append(retrieval.read('bucket', 'text.txt'))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [LINES] * 8
+    assert minio.requests['get_object'] == 1
+    assert retrieval.single_flight.stats['coalesced'] == 7
+
+
+def test_concurrent_reads_on_different_clients_stay_apart():
+    single_flight = SingleFlight()
+    retrievals = []
+    for data in (b'first server', b'second server'):
+        minio = FakeMinio()
+        minio.make_bucket('bucket')
+        put(minio, 'key', data)
+        minio.get_delay = lambda _: 0.1
+        retrievals.append(DataRetrieval(FakeMinioManager(minio), segment_index=SegmentIndex(),
+                                        single_flight=single_flight))
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def read(retrieval):
+        barrier.wait()
+        results[id(retrieval)] = retrieval.read('bucket', 'key')
+
+    threads = [threading.Thread(target=read, args=(retrieval,)) for retrieval in retrievals]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [results[id(retrieval)] for retrieval in retrievals] == [
+        b'first server', b'second server',
+    ]
+    assert single_flight.stats['coalesced'] == 0
+
+
+def test_newcomer_after_last_awaiter_cancels_starts_a_new_call():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(len(calls))
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.05)  # cleanup still running when the newcomer arrives
+            raise
+        return 'unreachable'
+
+    async def fast():
+        calls.append(len(calls))
+        return 'fresh'
+
+    async def main():
+        first = asyncio.ensure_future(single_flight.ado('key', slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await single_flight.ado('key', fast)
+
+    assert asyncio.run(main()) == 'fresh'
+    assert calls == [0, 1]
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import stat
+
+import pytest
+
+from DataLakeAgent import BatchIngestion, DataLakeAgent, IngestSpool, SchemaCache
+
+from conftest import ingestion, s3_error
+
+
+def test_async_ingest_goes_through_the_spool(manager, minio, tmp_path):
+    agent = DataLakeAgent(manager, spool_dir=str(tmp_path), schema_cache=SchemaCache())
+    agent.ingest_spool.retry_delay = agent.ingest_spool.max_retry_delay = 0.01
+    agent.run('ingest', bucket_name='bucket', data=b'warm-up', object_name='warm-up')
+    assert agent.run('flush', timeout=5)
+    minio.fail_puts = s3_error('ServiceUnavailable')
+
+    async def main():
+        await agent.arun('ingest', bucket_name='bucket', data=b'payload', object_name='key')
+
+    asyncio.run(main())
+    assert not agent.run('flush', timeout=0.1)
+    minio.fail_puts = None
+    assert agent.run('flush', timeout=5)
+    agent.run('close')
+    assert minio.object_data('bucket', 'key') == b'payload'
+    with pytest.raises(RuntimeError, match='closed'):
+        agent.run('ingest', bucket_name='bucket', data=b'late', object_name='late')
+
+
+def test_spool_uploads_after_outage_and_recovers(manager, minio, tmp_path):
+    data_ingestion = ingestion(manager)
+    data_ingestion.bucket_manager.run('bucket')
+    batch = BatchIngestion(data_ingestion.bucket_manager, data_ingestion)
+    minio.fail_puts = s3_error('ServiceUnavailable')
+    spool = IngestSpool(batch, str(tmp_path), retry_delay=0.01, max_retry_delay=0.02)
+    spool.run('bucket', b'durable', 'key')
+    assert not spool.flush(timeout=0.1)
+    spool.close(timeout=1)
+    assert any(name.endswith('.entry') for name in os.listdir(tmp_path))
+
+    minio.fail_puts = None
+    recovered = IngestSpool(batch, str(tmp_path), retry_delay=0.01)
+    assert recovered.flush(timeout=5)
+    recovered.close()
+    assert minio.object_data('bucket', 'key') == b'durable'
+    assert os.listdir(tmp_path) == []
+
+
+def test_spool_fsyncs_the_directory_after_renaming_an_entry(manager, tmp_path, monkeypatch):
+    data_ingestion = ingestion(manager)
+    spool = IngestSpool(BatchIngestion(data_ingestion.bucket_manager, data_ingestion),
+                        str(tmp_path))
+    synced = []
+    fsync = os.fsync
+
+    def record(fd):
+        synced.append(stat.S_ISDIR(os.fstat(fd).st_mode))
+        fsync(fd)
+
+    monkeypatch.setattr(os, 'fsync', record)
+    spool.run('bucket', b'durable', 'key')
+    assert synced == [False, True]
+    spool.close(timeout=5)
@@ -0,0 +1,87 @@
+import datetime
+import decimal
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from DataLakeAgent import (
+    STATS_SUFFIX, DataLoader, DataRetrieval, SegmentIndex, SingleFlight, stats_may_match,
+)
+
+from conftest import FRAME, FakeMinio, FakeMinioManager, csv_bytes, put
+
+
+def test_stats_sidecar_prunes_objects(loader, minio):
+    put(minio, 'p/low.csv', csv_bytes(FRAME[FRAME['id'] < 50]))
+    put(minio, 'p/high.csv', csv_bytes(FRAME[FRAME['id'] >= 50]))
+    for name in ('p/low.csv', 'p/high.csv'):
+        loader.run('bucket', name, stats=True)
+    stats = json.loads(minio.object_data('bucket', 'p/low.csv' + STATS_SUFFIX))
+    assert stats['rows'] == 50
+    assert stats['columns']['id']['max'] == 49
+    assert abs(stats['columns']['city']['distinct'] - 2) <= 1
+    gets = minio.requests['get_object']
+    df = loader.load_many('bucket', prefix='p/', filters=[('id', '>', 90)])
+    assert df['id'].tolist() == list(range(91, 100))
+    # Two sidecars plus one CSV: low.csv is never opened.
+    assert minio.requests['get_object'] - gets == 3
+
+
+def test_stats_sidecar_prunes_objects_in_versioned_buckets():
+    minio = FakeMinio(versioned=True)
+    minio.make_bucket('bucket')
+    loader = DataLoader(DataRetrieval(FakeMinioManager(minio), segment_index=SegmentIndex(),
+                                      single_flight=SingleFlight()))
+    put(minio, 'p/low.csv', csv_bytes(FRAME[FRAME['id'] < 50]))
+    put(minio, 'p/high.csv', csv_bytes(FRAME[FRAME['id'] >= 50]))
+    for name in ('p/low.csv', 'p/high.csv'):
+        loader.run('bucket', name, stats=True)
+    gets = minio.requests['get_object']
+    assert loader.load_many('bucket', prefix='p/', filters=[('id', '<', 3)])['id'].tolist() == [
+        0, 1, 2,
+    ]
+    assert minio.requests['get_object'] - gets == 3
+
+
+def test_stats_may_match_all_null_column():
+    stats = {'rows': 3, 'columns': {'x': {'dtype': 'float64', 'min': None, 'max': None,
+                                          'nulls': 3, 'distinct': 0}}}
+    assert not stats_may_match(stats, [('x', '==', 1)])
+    assert stats_may_match(stats, [('x', '!=', 1)])
+    assert stats_may_match(stats, [('x', 'not in', [1])])
+    assert not stats_may_match(stats, [('x', 'in', [1])])
+
+
+def test_stats_sidecar_of_dates_decimals_and_durations(loader, minio):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    table = pyarrow.table({
+        'day': pyarrow.array([datetime.date(2024, 1, 2), datetime.date(2024, 3, 4)]),
+        'price': pyarrow.array([decimal.Decimal('1.50'), decimal.Decimal('2.25')]),
+        'wait': pyarrow.array([datetime.timedelta(seconds=5), datetime.timedelta(minutes=1)]),
+    })
+    buffer = io.BytesIO()
+    pyarrow.parquet.write_table(table, buffer)
+    put(minio, 'typed.parquet', buffer.getvalue())
+    loader.run('bucket', 'typed.parquet', stats=True)
+    columns = json.loads(minio.object_data('bucket', 'typed.parquet' + STATS_SUFFIX))['columns']
+    assert (columns['day']['min'], columns['day']['max']) == ('2024-01-02', '2024-03-04')
+    assert (columns['price']['min'], columns['price']['max']) == ('1.50', '2.25')
+    assert stats_may_match({'rows': 2, 'columns': columns},
+                           [('wait', '>', pd.Timedelta(seconds=30))])
+    assert not stats_may_match({'rows': 2, 'columns': columns},
+                               [('wait', '>', pd.Timedelta(minutes=2))])
+
+
+def test_stats_sidecar_records_the_version_that_was_read(loader, minio):
+    put(minio, 'a.csv', csv_bytes())
+    read_version = minio.stat_object('bucket', 'a.csv').etag
+    chunks = loader.run('bucket', 'a.csv', chunksize=10, stats=True)
+    next(chunks)
+    put(minio, 'a.csv', csv_bytes(FRAME.head(3)))
+    list(chunks)
+    stats = json.loads(minio.object_data('bucket', 'a.csv' + STATS_SUFFIX))
+    assert stats['version'] == read_version
+    assert stats['version'] != minio.stat_object('bucket', 'a.csv').etag
@@ -0,0 +1,9 @@
+from conftest import LINES
+
+
+def test_stream_and_open(retrieval):
+    with retrieval.stream('bucket', 'text.txt', chunk_size=100) as chunks:
+        assert b''.join(chunks) == LINES
+    with retrieval.open('bucket', 'text.txt', chunk_size=100) as f:
+        assert f.readline() == b'line 0\n'
+        assert f.read() == LINES[len(b'line 0\n'):]
@@ -0,0 +1,21 @@
+from DataLakeAgent import BatchIngestion, DataRetrieval, DirectorySync, SegmentIndex
+
+from conftest import ingestion
+
+
+def test_directory_sync_uploads_only_changes(manager, minio, tmp_path):
+    data_ingestion = ingestion(manager)
+    batch = BatchIngestion(data_ingestion.bucket_manager, data_ingestion)
+    retrieval = DataRetrieval(manager, segment_index=SegmentIndex())
+    sync = DirectorySync(manager, batch, retrieval)
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'a.txt').write_bytes(b'a')
+    (tmp_path / 'sub' / 'b.txt').write_bytes(b'b')
+    assert sync.run(str(tmp_path), 'bucket', prefix='p/')['uploaded'] == 2
+    assert sync.run(str(tmp_path), 'bucket', prefix='p/') == {
+        'uploaded': 0, 'unchanged': 2, 'deleted': 0, 'failed': [],
+    }
+    (tmp_path / 'a.txt').unlink()
+    assert sync.run(str(tmp_path), 'bucket', prefix='p/', delete=True)['deleted'] == 1
+    assert 'p/a.txt' not in minio.buckets['bucket']
+    assert minio.object_data('bucket', 'p/sub/b.txt') == b'b'
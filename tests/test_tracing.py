@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+from DataLakeAgent import tracer
+
+from conftest import LINES
+
+
+def test_traced_action_nests_stage_spans(agent, tmp_path):
+    tracer.enable()
+    agent.run('ingest', bucket_name='bucket', data=b'payload', object_name='key')
+    spans = {span.name: span for span in tracer.spans}
+    action = spans['action:ingest']
+    assert action.parent_id is None
+    assert spans['DataIngestion.run'].parent_id == action.span_id
+    assert spans['DataIngestion.put'].parent_id == spans['DataIngestion.run'].span_id
+    assert spans['DataIngestion.put'].bytes_in == len(b'payload')
+    path = tracer.export_chrome(str(tmp_path / 'trace.json'))
+    with open(path) as f:
+        assert len(json.load(f)['traceEvents']) == len(tracer.spans)
+
+
+def test_pool_threads_trace_under_the_action(agent, minio):
+    tracer.enable()
+    agent.run('ingest_batch', items=[('bucket', f'k{i}', b'payload') for i in range(4)])
+    agent.run('ingest', bucket_name='bucket', data=iter([b'stream', b'ed']), object_name='s')
+    spans = list(tracer.spans)
+    ids = {span.span_id: span for span in spans}
+
+    def root(span):
+        while span.parent_id is not None:
+            span = ids[span.parent_id]
+        return span.name
+
+    puts = [span for span in spans if span.name == 'DataIngestion.put']
+    assert [root(span) for span in puts] == ['action:ingest_batch'] * 4 + ['action:ingest']
+    assert puts[-1].bytes_in == len(b'streamed')
+
+
+def test_traced_download_counts_streamed_parts(retrieval):
+    tracer.enable()
+    retrieval.download('bucket', 'text.txt', part_size=1000, max_workers=3)
+    spans = {span.name: span for span in tracer.spans}
+    download = spans['DataRetrieval.download']
+    assert download.bytes_out == len(LINES)
+    assert spans['minio.get_object'].parent_id == download.span_id
+
+
+def test_async_reads_trace_under_the_awaiting_span(retrieval):
+    tracer.enable()
+    with tracer.span('outer') as outer:
+        asyncio.run(retrieval.arun('bucket', 'text.txt'))
+    get = next(span for span in tracer.spans if span.name == 'minio.get_object')
+    assert get.parent_id == outer.span_id